@@ -1,50 +1,70 @@
+import io
 import json
 import os
-import subprocess
-import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urlparse
 
+import numpy as np
 import pandas as pd
-import requests
 import streamlit as st
-import tldextract
-from bs4 import BeautifulSoup
+
+from trufflehog_engine import (
+    DETECTOR_CATEGORIES,
+    EXPORT_FORMATS,
+    FS_EXCLUDE_EXTENSIONS,
+    FS_EXCLUDE_GLOBS,
+    GCS_API_ENDPOINT,
+    PARQUET_SUPPORTED,
+    ResultSpool,
+    ScanCancelled,
+    ScanProgress,
+    cached_export,
+    clear_history,
+    common_flags,
+    default_settings,
+    detector_flags,
+    diff_against_previous,
+    elasticsearch_cmd,
+    finish_git_scan,
+    github_experimental_cmd,
+    github_issues_cmd,
+    github_org_cmd,
+    huggingface_cmd,
+    init_history_db,
+    iter_scan_findings,
+    jenkins_cmd,
+    list_detector_profiles,
+    load_scan_findings,
+    plan_git_scan,
+    postman_cmd,
+    recent_scans,
+    record_scan,
+    run_target,
+    save_detector_profile,
+    stream_trufflehog,
+    unfinished_bucket_scan,
+    unfinished_crawl,
+    verify_findings,
+    write_export,
+)
 
 # Page configuration
 st.set_page_config(
     page_title="Trufflehog WebUI", layout="wide", page_icon="trufflehog-icon.png"
 )
+page_started = time.perf_counter()
 
-# History file path
-HISTORY_FILE = os.path.expanduser("~/trufflehog_scan_history.json")
-
-
-# Load scan history from file
-def load_history():
-    if os.path.exists(HISTORY_FILE):
-        try:
-            with open(HISTORY_FILE, "r") as f:
-                return json.load(f)
-        except:
-            return []
-    return []
 
+# Once per server process, not on every rerun
+st.cache_resource(init_history_db)()
 
-# Save scan history to file
-def save_history_to_file(history):
-    try:
-        with open(HISTORY_FILE, "w") as f:
-            json.dump(history, f)
-    except:
-        pass
-
-
-# Initialize session state for scan history
-if "scan_history" not in st.session_state:
-    st.session_state.scan_history = load_history()
 if "current_results" not in st.session_state:
     st.session_state.current_results = None
+if "current_scan_id" not in st.session_state:
+    st.session_state.current_scan_id = None
 
 # Apply a purpose-built TruffleHog console theme.
 st.markdown(
@@ -289,27 +309,118 @@ git_clone_timeout = st.sidebar.number_input(
     help="Timeout for git clone operations. 0 = no timeout. Useful for slow/large repositories.",
 )
 
+# Background execution
+MAX_BACKGROUND_JOBS = 4
+run_in_background = st.sidebar.checkbox(
+    "Run scans in background",
+    value=False,
+    help="Queue scans as background jobs so they keep running while you use the UI. "
+    f"Up to {MAX_BACKGROUND_JOBS} jobs run at once.",
+)
+
+# Verification strategy
+two_phase_verification = st.sidebar.checkbox(
+    "Two-phase verification",
+    value=False,
+    help="Detect with verification disabled for fast results, then verify each "
+    "distinct secret once in a separate stage. Verification outcomes are cached, "
+    "so a key seen on hundreds of pages is checked a single time.",
+)
+aggregate_secrets = st.sidebar.checkbox(
+    "Group identical secrets",
+    value=True,
+    help="Store and show each distinct secret once, with the list of places it "
+    "was found, instead of one finding per page or file.",
+)
+if two_phase_verification:
+    verification_workers = st.sidebar.number_input("Verification workers:", 1, 16, 4)
+    verification_ttl_hours = st.sidebar.number_input(
+        "Verification cache TTL (hours):", 0, 24 * 30, 24
+    )
+
+# Website scan batching
+web_batch_size = st.sidebar.number_input(
+    "Web pages per TruffleHog batch:",
+    1,
+    500,
+    50,
+    help="Fetched pages are scanned together by one TruffleHog process per batch. "
+    "Batches also flush every few seconds so slow crawls still report findings.",
+)
+
 # Detector selection
 st.sidebar.markdown("### 🔍 Detector Selection")
+
+
+# Copy a saved profile into the detector widgets (runs before they render)
+def apply_detector_profile():
+    profile = list_detector_profiles().get(st.session_state.detector_profile_name)
+    if not profile:
+        return
+    st.session_state.detectors_all = profile.get("all", True)
+    for category in DETECTOR_CATEGORIES:
+        st.session_state[f"detectors_{category}"] = category in profile.get(
+            "categories", []
+        )
+    st.session_state.detectors_include = profile.get("include", "")
+    st.session_state.detectors_exclude = profile.get("exclude", "")
+
+
+# Detector widgets take their values from session state only, so a loaded
+# profile never conflicts with a widget default. Re-seeded when a hidden
+# category checkbox has had its state dropped.
+st.session_state.setdefault("detectors_all", True)
+for category in DETECTOR_CATEGORIES:
+    st.session_state.setdefault(f"detectors_{category}", True)
+st.session_state.setdefault("detectors_include", "")
+st.session_state.setdefault("detectors_exclude", "")
+
+detector_profiles = list_detector_profiles()
+if detector_profiles:
+    profile_col, apply_col = st.sidebar.columns([3, 2])
+    profile_col.selectbox(
+        "Saved profile:", list(detector_profiles), key="detector_profile_name"
+    )
+    apply_col.button("Load", on_click=apply_detector_profile, key="load_profile")
+
 enable_all_detectors = st.sidebar.checkbox(
     "Enable All Detectors",
-    value=True,
+    key="detectors_all",
     help="When unchecked, you can select specific detector types",
 )
 
 detector_types = []
 if not enable_all_detectors:
     st.sidebar.markdown("**Select Detector Categories:**")
-    if st.sidebar.checkbox("Cloud Providers (AWS, Azure, GCP)", value=True):
-        detector_types.append("cloud")
-    if st.sidebar.checkbox("Version Control (GitHub, GitLab)", value=True):
-        detector_types.append("vcs")
-    if st.sidebar.checkbox("Databases (MongoDB, MySQL, PostgreSQL)", value=True):
-        detector_types.append("database")
-    if st.sidebar.checkbox("API Keys & Tokens", value=True):
-        detector_types.append("api")
-    if st.sidebar.checkbox("Private Keys & Certificates", value=True):
-        detector_types.append("crypto")
+    for category, label in DETECTOR_CATEGORIES.items():
+        if st.sidebar.checkbox(label, key=f"detectors_{category}"):
+            detector_types.append(category)
+extra_include = st.sidebar.text_input(
+    "Also include detectors:",
+    key="detectors_include",
+    help="Comma-separated TruffleHog detector names, e.g. Slack,Stripe. "
+    "With 'Enable All Detectors' on, naming detectors here runs only those.",
+)
+extra_exclude = st.sidebar.text_input(
+    "Exclude detectors:",
+    key="detectors_exclude",
+    help="Comma-separated detector names to skip, e.g. URI,Box.",
+)
+detector_profile = {
+    "all": enable_all_detectors,
+    "categories": detector_types,
+    "include": extra_include,
+    "exclude": extra_exclude,
+}
+save_col, save_btn_col = st.sidebar.columns([3, 2])
+new_profile_name = save_col.text_input("Profile name:", "", key="new_profile_name")
+if save_btn_col.button("Save", key="save_profile", disabled=not new_profile_name):
+    save_detector_profile(new_profile_name.strip(), detector_profile)
+    st.sidebar.success(f"Saved detector profile '{new_profile_name.strip()}'.")
+if not enable_all_detectors and not detector_types and not extra_include:
+    st.sidebar.warning("No detector categories selected; all detectors will run.")
+elif detector_flags(detector_profile):
+    st.sidebar.caption(" ".join(detector_flags(detector_profile)))
 
 # Scan mode selection
 st.sidebar.markdown("---")
@@ -333,26 +444,32 @@ desc = {
 scan_mode = st.sidebar.selectbox("Scan Mode:", list(desc.keys()))
 st.sidebar.markdown(f"**Description:** {desc[scan_mode]}")
 
-# Scan History in sidebar
-st.sidebar.markdown("---")
-st.sidebar.markdown("### 📜 Scan History")
-if st.session_state.scan_history:
-    for i, scan in enumerate(
-        reversed(st.session_state.scan_history[-10:])
-    ):  # Show last 10
-        if st.sidebar.button(
-            f"{scan['timestamp']} - {scan['mode']} ({scan['count']} results)",
-            key=f"history_{i}",
-        ):
-            st.session_state.current_results = scan["results"]
+
+# Scan History in sidebar, as a fragment so browsing it doesn't rerun the app
+def render_history_panel():
+    st.markdown("### 📜 Scan History")
+    history_scans = recent_scans()
+    if history_scans:
+        for scan in history_scans:
+            if st.button(
+                f"{scan['timestamp']} - {scan['mode']} ({scan['count']} results)",
+                key=f"history_{scan['id']}",
+            ):
+                st.session_state.current_results = load_scan_findings(scan["id"])
+                st.session_state.current_scan_id = scan["id"]
+                st.rerun()
+        if st.button("Clear History"):
+            clear_history()
+            st.session_state.current_results = None
+            st.session_state.current_scan_id = None
             st.rerun()
-    if st.sidebar.button("Clear History"):
-        st.session_state.scan_history = []
-        save_history_to_file([])
-        st.session_state.current_results = None
-        st.rerun()
-else:
-    st.sidebar.caption("Completed scans will appear here for quick review.")
+    else:
+        st.caption("Completed scans will appear here for quick review.")
+
+
+with st.sidebar:
+    st.markdown("---")
+    st.fragment(render_history_panel)()
 
 st.markdown(
     """
@@ -365,120 +482,109 @@ st.markdown(
 )
 
 
+# Engine settings from the sidebar controls
+def scan_settings():
+    return default_settings(
+        concurrency=concurrency,
+        git_clone_timeout=git_clone_timeout,
+        detectors=detector_profile,
+        verify=verification_settings(),
+        aggregate=aggregate_secrets,
+    )
+
+
 # Helper function to add common flags to command
-def add_common_flags(cmd):
+def add_common_flags(cmd, worker_concurrency=None):
     """Add common Trufflehog flags to command"""
-    cmd.extend(["--results=verified,unknown", "--json", "--no-update"])
-    if concurrency != 8:  # Only add if not default
-        cmd.extend(["--concurrency", str(concurrency)])
-    if git_clone_timeout > 0:
-        cmd.extend(["--git-clone-timeout", f"{git_clone_timeout}s"])
-    return cmd
-
-
-# Unified TruffleHog runner with progress tracking
-def run_trufflehog(cmd, out_file_path=None, show_progress=True):
-    records = []
-    if out_file_path:
-        os.makedirs(os.path.dirname(out_file_path), exist_ok=True)
-        mode = "a" if os.path.exists(out_file_path) else "w"
-        proc = subprocess.Popen(
-            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-        )
+    return common_flags(cmd, scan_settings(), worker_concurrency)
 
-        if show_progress:
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-
-        with open(out_file_path, mode) as out_f:
-            line_count = 0
-            for line in proc.stdout:
-                out_f.write(line)
-                out_f.flush()
-                try:
-                    record = json.loads(line)
-                    records.append(record)
-                    line_count += 1
-                    if show_progress and line_count % 10 == 0:
-                        status_text.text(f"Found {line_count} secrets so far...")
-                except:
-                    continue
-
-        if show_progress:
-            progress_bar.progress(100)
-            status_text.text(f"Scan complete! Found {line_count} secrets.")
-
-        stderr = proc.stderr.read()
-        proc.wait()
-        if proc.returncode != 0:
-            st.error(f"TruffleHog error: {stderr.strip()}")
-        return records
-    else:
-        proc = subprocess.run(
-            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-        )
-        if proc.returncode != 0:
-            st.error(f"TruffleHog error: {proc.stderr.strip()}")
-            return []
-        for line in proc.stdout.splitlines():
-            try:
-                records.append(json.loads(line))
-            except:
-                continue
-        return records
-
-
-# Crawl-and-scan helper with progress tracking
-def crawl_and_scan(start_url, max_pages, scope, out_file_path):
-    seen, queue, all_results = set(), [start_url], []
-    parsed = urlparse(start_url)
-    host = parsed.netloc.split(":")[0]
-    parts = host.split(".")
-    root_domain = ".".join(parts[-2:]) if len(parts) >= 2 else host
-
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-
-    while queue and len(seen) < max_pages:
-        url = queue.pop(0)
-        if url in seen:
-            continue
-        seen.add(url)
-
-        # Update progress
-        progress = int((len(seen) / max_pages) * 100)
-        progress_bar.progress(progress)
-        status_text.text(
-            f"Crawling: {len(seen)}/{max_pages} pages | Current: {url[:50]}..."
-        )
 
-        try:
-            resp = requests.get(url, timeout=5)
-            resp.raise_for_status()
-            soup = BeautifulSoup(resp.text, "html.parser")
-            for a in soup.find_all("a", href=True):
-                link = urljoin(url, a["href"])
-                nl = urlparse(link).netloc.split(":")[0]
-                if (
-                    scope == "Root Domain"
-                    and tldextract.extract(link).registered_domain != root_domain
-                ):
-                    continue
-                if scope == "Exact Host" and nl != host:
-                    continue
-                if link not in seen:
-                    queue.append(link)
-            tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".html")
-            tmp.write(resp.text.encode())
-            tmp.flush()
-            cmd = add_common_flags(["trufflehog", "filesystem", tmp.name])
-            all_results.extend(run_trufflehog(cmd, out_file_path, show_progress=False))
-        except Exception as e:
-            st.warning(f"Failed to fetch {url}: {e}")
+# One row of the live results table
+def finding_row(record):
+    return {
+        "Verified": "✅" if record.get("Verified") else "⚠️",
+        "Detector": record.get("DetectorName", "Unknown"),
+        "Source": record.get("SourceName", ""),
+        "Secret": mask_secret(record.get("Raw", "")),
+    }
+
+
+# Most recent findings shown while a scan is still running
+LIVE_TABLE_ROWS = 200
+
 
-    progress_bar.progress(100)
-    status_text.text(f"Crawl complete! Scanned {len(seen)} pages.")
-    return all_results
+# Unified TruffleHog runner with live results table and cancel support
+def run_trufflehog(cmd, out_file_path=None, show_progress=True, return_status=False):
+    records = ResultSpool(out_file_path)
+    if show_progress:
+        status_col, cancel_col = st.columns([4, 1])
+        status_text = status_col.empty()
+        # Clicking reruns the script, which interrupts the loop below and kills
+        # the TruffleHog process group on the way out.
+        cancel_col.button("⏹️ Cancel scan", key="cancel_scan")
+        live_table = st.empty()
+        started = time.monotonic()
+
+        def show_live_results():
+            status_text.text(
+                f"Found {len(records)} secrets so far... "
+                f"({time.monotonic() - started:.0f}s elapsed)"
+            )
+            if records:
+                live_table.dataframe(
+                    pd.DataFrame([finding_row(r) for r in records[-LIVE_TABLE_ROWS:]]),
+                    width="stretch",
+                    hide_index=True,
+                )
+
+    returncode, stderr = stream_trufflehog(
+        cmd,
+        records.append,
+        on_tick=show_live_results if show_progress else None,
+    )
+
+    if show_progress:
+        show_live_results()
+        status_text.text(f"Scan complete! Found {len(records)} secrets.")
+    if returncode != 0:
+        st.error(f"TruffleHog error: {stderr}")
+        if not out_file_path:
+            records = []
+    if return_status:
+        return records, returncode == 0
+    return records
+
+
+# Draws engine progress into the page. Elements are created on first use, so
+# each scan shows only what it reports, in the order it first reports it.
+class StreamlitProgress(ScanProgress):
+    def __init__(self):
+        self._bar = self._status = self._metrics = self._table = None
+
+    def status(self, text):
+        if self._status is None:
+            self._status = st.empty()
+        self._status.text(text)
+
+    def fraction(self, value):
+        if self._bar is None:
+            self._bar = st.progress(0)
+        self._bar.progress(int(value * 100))
+
+    def metrics(self, values):
+        if self._metrics is None:
+            columns = st.columns(len(values))
+            self._metrics = {name: col.empty() for name, col in zip(values, columns)}
+        for name, value in values.items():
+            self._metrics[name].metric(name, value)
+
+    def table(self, rows):
+        if self._table is None:
+            self._table = st.empty()
+        self._table.dataframe(pd.DataFrame(rows), width="stretch", hide_index=True)
+
+    def notice(self, level, text):
+        getattr(st, level)(text)
 
 
 def mask_secret(value):
@@ -489,28 +595,536 @@ def mask_secret(value):
     return f"{value[:4]}{'•' * min(24, len(value) - 8)}{value[-4:]}"
 
 
-# Function to save scan to history
-def save_to_history(scan_mode, records):
-    st.session_state.scan_history.append(
-        {
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "mode": scan_mode,
-            "count": len(records),
-            "results": records,
+# Columnar view of a result set: detector names as categorical codes plus
+# precomputed row-index arrays per detector and per verification state, so
+# counting, filtering and paging never loop over the raw records.
+class ResultIndex:
+    def __init__(self, records, fingerprints=None):
+        self.records = records
+        # One pass, so a disk-backed result set is only read once
+        names = []
+        self.verified = np.zeros(len(records), dtype=bool)
+        self.occurrences = np.ones(len(records), dtype=np.int64)
+        self.aggregated = False
+        for i, r in enumerate(records):
+            names.append(r.get("DetectorName", "Unknown"))
+            self.verified[i] = bool(r.get("Verified", False))
+            if "OccurrenceCount" in r:
+                self.occurrences[i] = r["OccurrenceCount"]
+                self.aggregated = True
+        detector = pd.Categorical(names)
+        self.codes = detector.codes
+        self.detectors = list(detector.categories)
+        self.verified_rows = np.flatnonzero(self.verified)
+        self.unverified_rows = np.flatnonzero(~self.verified)
+        order = np.argsort(self.codes, kind="stable")
+        bounds = np.searchsorted(self.codes[order], np.arange(len(self.detectors) + 1))
+        self.detector_rows = {
+            name: order[bounds[i] : bounds[i + 1]]
+            for i, name in enumerate(self.detectors)
         }
+        self.fingerprints = fingerprints
+        self._views = {}
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def all_rows(self):
+        return np.arange(len(self.records))
+
+    # Rows whose fingerprint is in a set (computed once per named view)
+    def view_rows(self, name, fingerprints):
+        if name not in self._views:
+            self._views[name] = np.flatnonzero(
+                np.fromiter(
+                    (fp in fingerprints for fp in self.fingerprints),
+                    dtype=bool,
+                    count=len(self.records),
+                )
+            )
+        return self._views[name]
+
+    def detectors_in(self, rows):
+        return [self.detectors[code] for code in np.unique(self.codes[rows])]
+
+    # Narrow rows by verification state and/or detector names
+    def select(self, rows, verified=None, detectors=None):
+        if verified is not None:
+            rows = np.intersect1d(
+                rows,
+                self.verified_rows if verified else self.unverified_rows,
+                assume_unique=True,
+            )
+        if detectors is not None:
+            wanted = [
+                self.detector_rows[d] for d in detectors if d in self.detector_rows
+            ]
+            rows = np.intersect1d(
+                rows,
+                np.concatenate(wanted) if wanted else np.empty(0, dtype=np.intp),
+                assume_unique=True,
+            )
+        return rows
+
+    def take(self, rows):
+        return [self.records[i] for i in rows]
+
+
+# Build (or reuse) the index for a result list held in session state
+def result_index(records, fingerprints=None, key="result_index"):
+    index = st.session_state.get(key)
+    if index is None or index.records is not records:
+        index = st.session_state[key] = ResultIndex(records, fingerprints)
+    return index
+
+
+# Verification settings handed to UI-free code; None when verifying inline
+def verification_settings():
+    if not two_phase_verification:
+        return None
+    return {
+        "workers": verification_workers,
+        "ttl_seconds": verification_ttl_hours * 3600,
+    }
+
+
+# Run phase two of a two-phase scan with a spinner and a short summary
+def verify_with_progress(records):
+    settings = verification_settings()
+    if settings is None or not records:
+        return
+    with st.spinner("Verifying distinct secrets..."):
+        stats = verify_findings(records, **settings)
+    st.caption(
+        f"Verification: {stats['candidates']} distinct secret(s) from "
+        f"{stats['findings']} finding(s); {stats['cached']} from cache, "
+        f"{stats['checked']} checked, {stats['verified']} verified, "
+        f"{stats['dropped']} finding(s) of invalid secrets dropped."
+    )
+    if stats["unresolved"]:
+        st.warning(
+            f"{stats['unresolved']} distinct secret(s) could not be re-checked and "
+            "are left unverified (see each finding's VerificationError). They are "
+            "not cached, so the next scan tries them again."
+        )
+
+
+# Function to save scan to history; returns (records, scan id) as stored
+def save_to_history(scan_mode, records, target=""):
+    verify_with_progress(records)
+    _, scan_id = record_scan(scan_mode, records, target, aggregate_secrets)
+    st.session_state.current_scan_id = scan_id
+    # Reloaded from the history store: disk-backed, in diff fingerprint order
+    return load_scan_findings(scan_id), scan_id
+
+
+# Git scan shared by the remote, local and SSH modes
+def scan_git_repo(scan_mode, repo, branch, incremental, output_path):
+    plan = plan_git_scan(repo, branch, incremental, scan_settings())
+    watermark = plan["watermark"]
+    if incremental and not plan["head"]:
+        st.warning("Could not resolve the repository HEAD; watermark not updated.")
+    if plan["cmd"] is None:
+        st.info(f"No new commits since the last scan ({plan['head'][:12]}).")
+        if run_in_background:
+            return None
+        new_records, ok = [], True
+    elif watermark is not None:
+        st.info(f"Incremental scan: commits after {watermark['head_commit'][:12]}.")
+    elif incremental:
+        st.info(
+            "No earlier scan of this repository and branch to continue from; "
+            "running a full scan."
+        )
+
+    if plan["cmd"] is not None:
+        if run_in_background:
+            return launch_scan(
+                scan_mode,
+                plan["target"],
+                output_path,
+                plan["cmd"],
+                "",
+                finalize=lambda recs, ok: finish_git_scan(scan_mode, plan, recs, ok),
+            )
+        new_records, ok = run_trufflehog(plan["cmd"], output_path, return_status=True)
+
+    _, scan_id = finish_git_scan(scan_mode, plan, new_records, ok)
+    st.session_state.current_scan_id = scan_id
+    records = load_scan_findings(scan_id)
+    if watermark is not None:
+        st.caption(
+            f"{len(new_records)} finding(s) in new commits, "
+            f"{len(records)} total for {plan['target']}."
+        )
+    return records
+
+
+# Branch and incremental options shared by the git scan modes
+def git_scan_options(key):
+    branch_col, incremental_col = st.columns([2, 1])
+    with branch_col:
+        branch = st.text_input(
+            "Branch (optional):",
+            "",
+            key=f"{key}_branch",
+            help="Leave empty to scan every branch.",
+        )
+    with incremental_col:
+        incremental = st.checkbox(
+            "Incremental (only new commits)",
+            key=f"{key}_incremental",
+            help="Scan only commits since this repo/branch was last scanned and "
+            "merge them with the stored findings.",
+        )
+    return branch.strip(), incremental
+
+
+# Parallelism and resume controls shared by the bucket scan modes
+def bucket_shard_options(scan_mode, target, key):
+    workers = st.number_input(
+        "Parallel TruffleHog processes:",
+        1,
+        32,
+        min(4, os.cpu_count() or 1),
+        key=f"{key}_workers",
+        help="Used when the scan is split into several shards. The sidebar "
+        "concurrency value is the total budget shared between them.",
+    )
+    interrupted = unfinished_bucket_scan(scan_mode, target)
+    if interrupted is not None and st.checkbox(
+        f"Resume interrupted scan #{interrupted['id']} "
+        f"({interrupted['counts'].get('done', 0)}/"
+        f"{sum(interrupted['counts'].values())} shards done, "
+        f"last checkpoint {interrupted['updated']})",
+        value=True,
+        key=f"{key}_resume",
+    ):
+        return workers, interrupted
+    return workers, None
+
+
+# Background scans. Jobs live in a process-wide manager, so they survive
+# Streamlit reruns and several can run at once while results are triaged.
+class ScanJob:
+    def __init__(
+        self,
+        job_id,
+        scan_mode,
+        target,
+        output_path,
+        cmd,
+        finalize=None,
+        verify=None,
+        aggregate=False,
+        spec=None,
+        settings=None,
+    ):
+        self.id = job_id
+        self.scan_mode = scan_mode
+        self.target = target
+        self.output_path = output_path  # JSONL result spool
+        self.cmd = cmd
+        self.finalize = finalize
+        self.verify = verify  # Two-phase verification settings, if enabled
+        self.aggregate = aggregate  # Group identical secrets when saving
+        # Engine scan profile run instead of cmd (see run_target), and the
+        # settings it runs with
+        self.spec = spec
+        self.settings = settings
+        self.state = "queued"
+        self.findings = 0
+        self.verified = 0
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.error = None
+        self.scan_id = None
+        self.detail = ""  # Latest progress line of a profile job
+        self.notices = []  # Its warnings and errors
+        self.cancel_event = threading.Event()
+
+    def summary(self):
+        end = self.finished or time.time()
+        return {
+            "Job": self.id,
+            "Mode": self.scan_mode,
+            "Target": self.target,
+            "State": self.state,
+            "Findings": self.findings,
+            "Verified": self.verified,
+            "Seconds": round(end - (self.started or end), 1),
+            "Progress": self.detail,
+            "Output": self.output_path,
+        }
+
+
+class ScanJobManager:
+    def __init__(self, max_workers=MAX_BACKGROUND_JOBS):
+        self.pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="scan-job"
+        )
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.next_id = 1
+
+    def submit(
+        self,
+        scan_mode,
+        target,
+        output_path,
+        cmd,
+        finalize=None,
+        verify=None,
+        aggregate=False,
+        spec=None,
+        settings=None,
+    ):
+        with self.lock:
+            job = ScanJob(
+                self.next_id,
+                scan_mode,
+                target,
+                output_path,
+                cmd,
+                finalize,
+                verify,
+                aggregate,
+                spec,
+                settings,
+            )
+            self.jobs[job.id] = job
+            self.next_id += 1
+        self.pool.submit(self._run, job)
+        return job
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job and job.state in ("queued", "running"):
+            job.cancel_event.set()
+            if job.state == "queued":
+                job.state = "cancelled"
+
+    def active(self):
+        return [
+            j
+            for j in self.jobs.values()
+            if j.state in ("queued", "running", "verifying")
+        ]
+
+    def _run(self, job):
+        if job.cancel_event.is_set():
+            return
+        job.state = "running"
+        job.started = time.time()
+        if job.spec is not None:
+            self._run_profile(job)
+            return
+        records = ResultSpool(job.output_path)
+
+        def on_record(record):
+            records.append(record)
+            job.findings += 1
+            if record.get("Verified", False):
+                job.verified += 1
+
+        try:
+            returncode, stderr = stream_trufflehog(
+                job.cmd, on_record, cancel_event=job.cancel_event
+            )
+            if job.cancel_event.is_set():
+                job.state = "cancelled"
+                return
+            ok = returncode == 0
+            if job.finalize:
+                _, job.scan_id = job.finalize(records, ok)
+            else:
+                if job.verify and records:
+                    job.state = "verifying"
+                    verify_findings(records, **job.verify)
+                    job.findings = len(records)
+                    job.verified = sum(1 for r in records if r.get("Verified"))
+                _, job.scan_id = record_scan(
+                    job.scan_mode, records, job.target, job.aggregate
+                )
+            job.state = "done" if ok else "failed"
+            job.error = None if ok else stderr[-1000:]
+        except Exception as e:
+            job.state = "failed"
+            job.error = str(e)
+        finally:
+            job.finished = time.time()
+
+    def _run_profile(self, job):
+        try:
+            records, job.scan_id, problems = run_target(
+                job.spec, job.output_path, job.settings, JobProgress(job)
+            )
+            job.findings = len(records)
+            job.verified = sum(1 for r in records if r.get("Verified"))
+            job.detail = ""
+            job.state = "failed" if problems else "done"
+            job.error = "; ".join(p[-300:] for p in problems) or None
+        except ScanCancelled:
+            job.state = "cancelled"
+        except Exception as e:
+            job.state = "failed"
+            job.error = str(e)
+        finally:
+            job.finished = time.time()
+
+
+# Keeps a profile job's latest progress for the jobs panel; raises ScanCancelled
+# on its next report once the job is cancelled
+class JobProgress(ScanProgress):
+    def __init__(self, job):
+        self.job = job
+
+    def _check_cancelled(self):
+        if self.job.cancel_event.is_set():
+            raise ScanCancelled()
+
+    def status(self, text):
+        self._check_cancelled()
+        self.job.detail = text
+
+    def fraction(self, value):
+        self._check_cancelled()
+
+    def metrics(self, values):
+        self._check_cancelled()
+        self.job.detail = ", ".join(f"{k}: {v}" for k, v in values.items())
+
+    def table(self, rows):
+        self._check_cancelled()
+
+    def notice(self, level, text):
+        if level in ("warning", "error"):
+            self.job.notices.append(text)
+
+
+@st.cache_resource
+def scan_jobs():
+    return ScanJobManager()
+
+
+def announce_job(job):
+    st.success(
+        f"Background job #{job.id} queued. Track it under Background jobs; "
+        "you can keep working meanwhile."
     )
-    # Persist to file
-    save_history_to_file(st.session_state.scan_history)
+
+
+# Run a single-command scan inline, or hand it to the background job manager
+def launch_scan(scan_mode, target, output_path, cmd, spinner_text, finalize=None):
+    if run_in_background:
+        announce_job(
+            scan_jobs().submit(
+                scan_mode,
+                target,
+                output_path,
+                cmd,
+                finalize,
+                verification_settings(),
+                aggregate_secrets,
+            )
+        )
+        return None
+    with st.spinner(spinner_text):
+        records = run_trufflehog(cmd, output_path)
+        records, _ = save_to_history(scan_mode, records, target)
+    return records
+
+
+# Run an engine scan profile (a run_target spec, as in the batch CLI) inline
+# with live progress, or hand it to the background job manager. Returns
+# (records, problems); records is None when queued or failed.
+def run_profile(scan_mode, target, output_path, spec, spinner_text):
+    if run_in_background:
+        announce_job(
+            scan_jobs().submit(
+                scan_mode,
+                target,
+                output_path,
+                None,
+                spec=spec,
+                settings=scan_settings(),
+            )
+        )
+        return None, []
+    try:
+        with st.spinner(spinner_text):
+            _, scan_id, problems = run_target(
+                spec, output_path, scan_settings(), StreamlitProgress()
+            )
+    except Exception as e:
+        st.error(f"Scan failed: {e}")
+        return None, []
+    for problem in problems:
+        st.error(problem[-1000:])
+    st.session_state.current_scan_id = scan_id
+    return load_scan_findings(scan_id), problems
+
+
+# Live view of background jobs; polls on its own while any job is active
+def render_jobs_panel():
+    manager = scan_jobs()
+    if not manager.jobs:
+        return
+    st.markdown("### 🧵 Background jobs")
+    jobs = sorted(manager.jobs.values(), key=lambda j: j.id, reverse=True)
+    st.dataframe(
+        pd.DataFrame([j.summary() for j in jobs]), width="stretch", hide_index=True
+    )
+    for job in jobs:
+        if job.state == "failed" and job.error:
+            st.caption(f"Job #{job.id} error: {job.error}")
+        for text in job.notices:
+            st.caption(f"Job #{job.id}: {text}")
+    job_col, load_col, cancel_col = st.columns([2, 1, 1])
+    with job_col:
+        job_id = st.selectbox(
+            "Job:",
+            [j.id for j in jobs],
+            format_func=lambda i: f"#{i} {manager.jobs[i].scan_mode} "
+            f"- {manager.jobs[i].target}",
+            key="selected_job",
+        )
+    job = manager.jobs[job_id]
+    with load_col:
+        if st.button(
+            "📂 Load results",
+            disabled=job.scan_id is None,
+            width="stretch",
+        ):
+            st.session_state.current_results = load_scan_findings(job.scan_id)
+            st.session_state.current_scan_id = job.scan_id
+            st.rerun()
+    with cancel_col:
+        if st.button(
+            "⏹️ Cancel job",
+            disabled=job.state not in ("queued", "running"),
+            width="stretch",
+        ):
+            manager.cancel(job.id)
+            st.rerun(scope="fragment")
 
 
 # Main logic
 records = None
 
+if st.session_state.get("cancel_scan"):
+    st.warning(
+        "Scan cancelled and its TruffleHog processes were stopped. "
+        "Findings up to that point are still in the JSONL file in Downloads."
+    )
+
 if scan_mode == "Website Scan":
     page_type_descriptions = {
         "Single Page": (
-            "Fetches one URL, saves its HTML, and runs TruffleHog's filesystem scanner. "
-            "Good for auditing a single page."
+            "Fetches one URL and streams its body straight into TruffleHog's stdin "
+            "scanner without saving the page to disk. Good for auditing a single page."
         ),
         "Crawl Entire Site": (
             "Starts from the given URL, follows in-domain links up to your max-pages limit, "
@@ -518,13 +1132,33 @@ if scan_mode == "Website Scan":
         ),
         "Directory Brute-Force": (
             "Uses Gobuster with the SecLists raft-small-directories wordlist to discover "
-            "common subfolders, then fetches each and scans them with TruffleHog."
+            "common subfolders, fetching and scanning each one with TruffleHog as soon "
+            "as Gobuster reports it."
         ),
     }
     page_mode = st.radio(
         "Choose Scan Type:", list(page_type_descriptions.keys()), key="page_mode"
     )
     st.markdown(f"**How this works:** {page_type_descriptions[page_mode]}")
+    # Stored per sub-mode, so a crawl is never diffed against a single page
+    history_mode = f"{scan_mode} ({page_mode})"
+    use_http_cache = st.checkbox(
+        "Skip unchanged pages",
+        value=True,
+        key="http_cache",
+        help="Send conditional requests (ETag / Last-Modified) and reuse the "
+        "findings of page bodies already scanned with the same detectors.",
+    )
+    host_rate = st.number_input(
+        "Max requests per second per host:",
+        0.0,
+        1000.0,
+        10.0,
+        key="host_rate",
+        help="Token-bucket limit applied to every host. Rate-limited responses "
+        "(429 / 503) are retried with backoff, honouring Retry-After. "
+        "0 disables the limit.",
+    )
 
     # ────────── Single Page ──────────
     if page_mode == "Single Page":
@@ -534,22 +1168,48 @@ if scan_mode == "Website Scan":
             output_path = (
                 f"/home/kasm-user/Desktop/Downloads/trufflehog_single_{ts}.jsonl"
             )
-            with st.spinner("Scanning single page..."):
-                resp = requests.get(url, timeout=10)
-                resp.raise_for_status()
-                tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".html")
-                tmp.write(resp.text.encode())
-                tmp.flush()
-                cmd = add_common_flags(["trufflehog", "filesystem", tmp.name])
-                records = run_trufflehog(cmd, output_path)
-                save_to_history(scan_mode, records)
+            records, _ = run_profile(
+                history_mode,
+                url,
+                output_path,
+                {
+                    "profile": "website",
+                    "url": url,
+                    "cache": use_http_cache,
+                    "rate": host_rate,
+                },
+                "Scanning single page...",
+            )
 
     # ────────── Crawl Entire Site ──────────
     elif page_mode == "Crawl Entire Site":
         raw_url = st.text_input(
             "Enter any URL on the site to crawl:", "https://example.com/path"
         )
-        max_pages = st.number_input("Max pages to crawl:", 1, 100, 10)
+        max_pages = st.number_input(
+            "Max pages to crawl:",
+            1,
+            1_000_000,
+            10,
+            help="Includes pages crawled before an interruption when resuming.",
+        )
+        workers_col, per_host_col = st.columns(2)
+        with workers_col:
+            crawl_workers = st.number_input(
+                "Crawl workers:",
+                1,
+                64,
+                16,
+                help="Pages fetched in parallel. Connections are pooled and reused per host.",
+            )
+        with per_host_col:
+            per_host_limit = st.number_input(
+                "Max concurrent requests per host:",
+                1,
+                32,
+                4,
+                help="Caps parallel requests to any single host to stay polite.",
+            )
         scope = st.selectbox(
             "Crawl Scope:", ["Root Domain", "Exact Host"], key="crawl_scope"
         )
@@ -558,15 +1218,42 @@ if scan_mode == "Website Scan":
             "Exact Host": "Follows links whose host exactly matches the start URL (no subdomains).",
         }
         st.markdown(f"**Scope explanation:** {scope_desc[scope]}")
+        parsed = urlparse(raw_url)
+        start_site = f"{parsed.scheme}://{parsed.netloc}"
+        interrupted = unfinished_crawl(start_site, scope)
+        resume_crawl = False
+        if interrupted is not None:
+            resume_crawl = st.checkbox(
+                f"Resume interrupted crawl #{interrupted['id']} "
+                f"({interrupted['counts'].get('done', 0)} pages done, "
+                f"{interrupted['counts'].get('queued', 0)} queued, "
+                f"last checkpoint {interrupted['updated']})",
+                value=True,
+                key="crawl_resume",
+            )
         if st.button("Crawl and Scan"):
             ts = datetime.now().strftime("%Y%m%d_%H%M%S")
             output_path = (
                 f"/home/kasm-user/Desktop/Downloads/trufflehog_crawl_{ts}.jsonl"
             )
-            parsed = urlparse(raw_url)
-            start_site = f"{parsed.scheme}://{parsed.netloc}"
-            records = crawl_and_scan(start_site, max_pages, scope, output_path)
-            save_to_history(scan_mode, records)
+            records, _ = run_profile(
+                history_mode,
+                start_site,
+                output_path,
+                {
+                    "profile": "crawl",
+                    "url": start_site,
+                    "max_pages": max_pages,
+                    "scope": scope,
+                    "workers": crawl_workers,
+                    "per_host": per_host_limit,
+                    "batch_size": web_batch_size,
+                    "resume": resume_crawl,
+                    "cache": use_http_cache,
+                    "rate": host_rate,
+                },
+                "Crawling site...",
+            )
 
     # ────────── Directory Brute-Force ──────────
     else:
@@ -574,130 +1261,169 @@ if scan_mode == "Website Scan":
             "Enter base URL (e.g. https://example.com):", "https://example.com"
         )
         threads = st.number_input("Gobuster threads:", 10, 100, 50)
+        fetch_workers = st.number_input(
+            "Fetch workers:",
+            1,
+            64,
+            16,
+            help="Discovered paths fetched in parallel while Gobuster is still running.",
+        )
         if st.button("Scan Directories"):
             ts = datetime.now().strftime("%Y%m%d_%H%M%S")
             output_path = (
                 f"/home/kasm-user/Desktop/Downloads/trufflehog_dirbf_{ts}.jsonl"
             )
-            gobuster_log_path = os.path.join(
-                os.path.dirname(output_path), f"gobuster_dirbf_{ts}.txt"
-            )
             os.makedirs(os.path.dirname(output_path), exist_ok=True)
-
-            # Use bundled wordlist; fall back to downloading if missing
-            _bundled_wl = "/usr/share/wordlists/raft-small-directories.txt"
-            if os.path.exists(_bundled_wl):
-                wl_path = _bundled_wl
-            else:
-                with st.spinner("Downloading wordlist..."):
-                    wl_url = (
-                        "https://raw.githubusercontent.com/danielmiessler/"
-                        "SecLists/master/Discovery/Web-Content/raft-small-directories.txt"
-                    )
-                    wl_resp = requests.get(wl_url)
-                    wl_resp.raise_for_status()
-                    tmp_wl = tempfile.NamedTemporaryFile(delete=False, suffix=".txt")
-                    tmp_wl.write(wl_resp.content)
-                    tmp_wl.flush()
-                    wl_path = tmp_wl.name
-
-            # Run Gobuster with progress
-            with st.spinner("Running Gobuster..."):
-                cmd = [
-                    "gobuster",
-                    "dir",
-                    "-u",
-                    base_url,
-                    "-w",
-                    wl_path,
-                    "-t",
-                    str(threads),
-                    "-e",
-                    "-s",
-                    "200,204,301,302,307,401,403",
-                    "-b",
-                    "",
-                    "-q",
-                    "-o",
-                    gobuster_log_path,
-                ]
-                st.text(f"🔍 Running command: {' '.join(cmd)}")
-                subprocess.run(
-                    cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-                )
-                st.text(f"📄 Gobuster log saved to: {gobuster_log_path}")
-
-            # Parse found URLs
-            found_paths = []
-            with open(gobuster_log_path) as gf:
-                for line in gf:
-                    line = line.strip()
-                    if not line or line.startswith("===="):
-                        continue
-                    url_candidate = line.split()[0]
-                    found_paths.append(url_candidate)
-            st.success(f"Found {len(found_paths)} paths")
-
-            # Fetch each and scan with progress
-            records = []
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-
-            for idx, full_url in enumerate(found_paths):
-                progress = int(((idx + 1) / len(found_paths)) * 100)
-                progress_bar.progress(progress)
-                status_text.text(f"Scanning {idx + 1}/{len(found_paths)}: {full_url}")
-
-                try:
-                    resp = requests.get(full_url, timeout=10)
-                    resp.raise_for_status()
-                    tmp_html = tempfile.NamedTemporaryFile(delete=False, suffix=".html")
-                    tmp_html.write(resp.text.encode())
-                    tmp_html.flush()
-                    cmd = add_common_flags(["trufflehog", "filesystem", tmp_html.name])
-                    records.extend(
-                        run_trufflehog(cmd, output_path, show_progress=False)
-                    )
-                except Exception as e:
-                    st.warning(f"Failed to fetch {full_url}: {e}")
-
-            progress_bar.progress(100)
-            status_text.text(f"Directory scan complete!")
-            save_to_history(scan_mode, records)
+            records, _ = run_profile(
+                history_mode,
+                base_url,
+                output_path,
+                {
+                    "profile": "dirbf",
+                    "url": base_url,
+                    "threads": threads,
+                    "workers": fetch_workers,
+                    "batch_size": web_batch_size,
+                    "cache": use_http_cache,
+                    "rate": host_rate,
+                },
+                "Brute-forcing directories...",
+            )
+            gobuster_log_path = os.path.splitext(output_path)[0] + "_gobuster.txt"
+            st.text(f"📄 Gobuster log saved to: {gobuster_log_path}")
 
 elif scan_mode == "Git Repository Scan":
     repo = st.text_input("Enter Git Repo URL:", "https://github.com/user/repo.git")
+    branch, incremental = git_scan_options("gitrepo")
     if st.button("Scan Repository"):
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_gitrepo_{ts}.jsonl"
         with st.spinner("Scanning repository..."):
-            cmd = add_common_flags(["trufflehog", "git", repo])
-            records = run_trufflehog(cmd, output_path)
-            save_to_history(scan_mode, records)
+            records = scan_git_repo(scan_mode, repo, branch, incremental, output_path)
 
 elif scan_mode == "Local Git Repo Scan":
     path = st.text_input("Enter Local Path:", "file://./repo")
+    branch, incremental = git_scan_options("localgit")
     if st.button("Scan Local Repo"):
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_path = (
             f"/home/kasm-user/Desktop/Downloads/trufflehog_localgit_{ts}.jsonl"
         )
         with st.spinner("Scanning local repo..."):
-            cmd = add_common_flags(["trufflehog", "git", path])
-            records = run_trufflehog(cmd, output_path)
-            save_to_history(scan_mode, records)
+            records = scan_git_repo(scan_mode, path, branch, incremental, output_path)
 
 elif scan_mode == "GitHub Org Scan":
     org = st.text_input("Enter GitHub Org:", "trufflesecurity")
-    if st.button("Scan Org"):
-        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_path = (
-            f"/home/kasm-user/Desktop/Downloads/trufflehog_githuborg_{ts}.jsonl"
+    org_mode = st.radio(
+        "Org scan strategy:",
+        ["Single TruffleHog run", "Parallel per-repository"],
+        horizontal=True,
+        key="org_mode",
+        help="Parallel mode lists the org's repositories and scans them with a pool "
+        "of TruffleHog processes, showing results per repository as they finish.",
+    )
+    if org_mode == "Single TruffleHog run":
+        if st.button("Scan Org"):
+            ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+            output_path = (
+                f"/home/kasm-user/Desktop/Downloads/trufflehog_githuborg_{ts}.jsonl"
+            )
+            cmd = add_common_flags(github_org_cmd(org))
+            records = launch_scan(scan_mode, org, output_path, cmd, "Scanning org...")
+    else:
+        repo_source = st.selectbox(
+            "Repositories:", ["List from GitHub API", "Supplied list"]
+        )
+        if repo_source == "List from GitHub API":
+            api_col, token_col = st.columns(2)
+            with api_col:
+                api_url = st.text_input(
+                    "GitHub API URL:",
+                    "https://api.github.com",
+                    help="Point at GitHub Enterprise or a local stand-in server.",
+                )
+            with token_col:
+                gh_token = st.text_input(
+                    "GitHub token (optional):", "", type="password"
+                )
+            include_forks = st.checkbox("Include forks")
+        else:
+            repo_list = st.text_area(
+                "Repository clone URLs (one per line):",
+                "https://github.com/trufflesecurity/trufflehog.git",
+            )
+        repo_workers = st.number_input(
+            "Parallel TruffleHog processes:",
+            1,
+            32,
+            min(4, os.cpu_count() or 1),
+            help="The sidebar concurrency value is the total budget shared between "
+            "these processes.",
         )
-        with st.spinner("Scanning org..."):
-            cmd = add_common_flags(["trufflehog", "github", "--org", org])
-            records = run_trufflehog(cmd, output_path)
-            save_to_history(scan_mode, records)
+
+        # run_target specs; the engine lists the repositories when none are given
+        org_runs = []
+        if st.button("Scan Org Repositories"):
+            if repo_source == "List from GitHub API":
+                org_runs.append(
+                    {
+                        "api_url": api_url,
+                        "token": gh_token,
+                        "include_forks": include_forks,
+                    }
+                )
+            else:
+                repos = [
+                    line.strip() for line in repo_list.splitlines() if line.strip()
+                ]
+                if repos:
+                    org_runs.append({"repos": repos})
+                else:
+                    st.warning("No repositories to scan.")
+
+        failed_run = st.session_state.get("org_failed_repos")
+        if failed_run and failed_run["org"] == org:
+            st.warning(
+                f"{len(failed_run['repos'])} repositor(ies) failed in the last run."
+            )
+            if st.button("🔁 Retry failed repositories"):
+                org_runs.append(
+                    {
+                        "repos": failed_run["repos"],
+                        "merge_scan_id": failed_run["scan_id"],
+                    }
+                )
+
+        for run in org_runs:
+            ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+            output_path = (
+                f"/home/kasm-user/Desktop/Downloads/trufflehog_githuborg_{ts}.jsonl"
+            )
+            records, problems = run_profile(
+                scan_mode,
+                org,
+                output_path,
+                {
+                    "profile": "github-org",
+                    "org": org,
+                    "parallel": True,
+                    "workers": repo_workers,
+                    **run,
+                },
+                "Scanning org repositories...",
+            )
+            if records is not None:
+                # run_target reports each failed repository as "<repo> failed"
+                failed = [p.removesuffix(" failed") for p in problems]
+                st.session_state.org_failed_repos = (
+                    {
+                        "org": org,
+                        "repos": failed,
+                        "scan_id": st.session_state.current_scan_id,
+                    }
+                    if failed
+                    else None
+                )
 
 elif scan_mode == "GitHub Repo + Issues/PR Scan":
     repo = st.text_input("Enter GitHub Repo URL:", "https://github.com/user/repo.git")
@@ -706,91 +1432,175 @@ elif scan_mode == "GitHub Repo + Issues/PR Scan":
         output_path = (
             f"/home/kasm-user/Desktop/Downloads/trufflehog_ghissues_{ts}.jsonl"
         )
-        with st.spinner("Scanning issue/PR comments..."):
-            cmd = add_common_flags(
-                [
-                    "trufflehog",
-                    "github",
-                    "--repo",
-                    repo,
-                    "--issue-comments",
-                    "--pr-comments",
-                ]
-            )
-            records = run_trufflehog(cmd, output_path)
-            save_to_history(scan_mode, records)
+        cmd = add_common_flags(github_issues_cmd(repo))
+        records = launch_scan(
+            scan_mode, repo, output_path, cmd, "Scanning issue/PR comments..."
+        )
 
 elif scan_mode == "GitHub Experimental Scan":
     repo = st.text_input("Enter Repo URL:", "https://github.com/user/repo.git")
     if st.button("Run Experimental Scan"):
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_ghexp_{ts}.jsonl"
-        with st.spinner("Running experimental scan..."):
-            cmd = add_common_flags(
-                [
-                    "trufflehog",
-                    "github-experimental",
-                    "--repo",
-                    repo,
-                    "--object-discovery",
-                    "--delete-cached-data",
-                ]
-            )
-            records = run_trufflehog(cmd, output_path)
-            save_to_history(scan_mode, records)
+        cmd = add_common_flags(github_experimental_cmd(repo))
+        records = launch_scan(
+            scan_mode, repo, output_path, cmd, "Running experimental scan..."
+        )
 
 elif scan_mode == "S3 Bucket Scan":
-    bucket = st.text_input("Enter S3 Bucket:", "my-bucket")
+    bucket = st.text_input(
+        "Enter S3 Bucket(s):",
+        "my-bucket",
+        help="Comma-separated. Each bucket is scanned by its own process.",
+    )
+    buckets = [b.strip() for b in bucket.split(",") if b.strip()]
+    s3_workers, s3_resume = bucket_shard_options(scan_mode, ",".join(buckets), "s3")
     if st.button("Scan S3 Bucket"):
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_s3_{ts}.jsonl"
-        with st.spinner("Scanning S3 bucket..."):
-            cmd = add_common_flags(["trufflehog", "s3", "--bucket", bucket])
-            records = run_trufflehog(cmd, output_path)
-            save_to_history(scan_mode, records)
+        records, _ = run_profile(
+            scan_mode,
+            ",".join(buckets),
+            output_path,
+            {
+                "profile": "s3",
+                "buckets": buckets,
+                "workers": s3_workers,
+                "resume": s3_resume is not None,
+            },
+            "Scanning S3 bucket...",
+        )
 
 elif scan_mode == "S3 Bucket with IAM Role":
     role = st.text_input("Enter IAM Role ARN:", "arn:aws:iam::123456789012:role/MyRole")
+    role_buckets = st.text_area(
+        "Buckets to scan in parallel (optional, one per line):",
+        "",
+        help="Leave empty to scan every bucket the role can reach in one process.",
+    )
+    role_workers, role_resume = bucket_shard_options(scan_mode, role, "s3role")
     if st.button("Scan S3 with Role"):
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_s3role_{ts}.jsonl"
-        with st.spinner("Scanning S3 with IAM role..."):
-            cmd = add_common_flags(["trufflehog", "s3", "--role-arn", role])
-            records = run_trufflehog(cmd, output_path)
-            save_to_history(scan_mode, records)
+        records, _ = run_profile(
+            scan_mode,
+            role,
+            output_path,
+            {
+                "profile": "s3-role",
+                "role_arn": role,
+                "buckets": role_buckets,
+                "workers": role_workers,
+                "resume": role_resume is not None,
+            },
+            "Scanning S3 with IAM role...",
+        )
 
 elif scan_mode == "GCS Bucket Scan":
     pid = st.text_input("Enter GCP Project ID:", "my-project")
+    gcs_entries = st.text_area(
+        "Buckets or bucket/prefix entries to scan in parallel (optional, one per line):",
+        "",
+        help="Leave empty to scan every bucket in the project in one process.",
+    )
+    split_prefixes = st.checkbox(
+        "Split buckets by top-level prefix",
+        value=False,
+        key="gcs_split_prefixes",
+        help="Lists each bucket's top-level prefixes and scans them in parallel.",
+    )
+    if split_prefixes:
+        gcs_endpoint = st.text_input(
+            "Storage API endpoint:", GCS_API_ENDPOINT, key="gcs_endpoint"
+        )
+        gcs_token = st.text_input(
+            "Access token for listing (optional):", "", type="password"
+        )
+    gcs_workers, gcs_resume = bucket_shard_options(scan_mode, pid, "gcs")
     if st.button("Scan GCS Bucket"):
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_gcs_{ts}.jsonl"
-        with st.spinner("Scanning GCS bucket..."):
-            cmd = add_common_flags(
-                ["trufflehog", "gcs", "--project-id", pid, "--cloud-environment"]
-            )
-            records = run_trufflehog(cmd, output_path)
-            save_to_history(scan_mode, records)
+        records, _ = run_profile(
+            scan_mode,
+            pid,
+            output_path,
+            {
+                "profile": "gcs",
+                "project_id": pid,
+                "buckets": gcs_entries,
+                "split_prefixes": split_prefixes,
+                "endpoint": gcs_endpoint if split_prefixes else "",
+                "token": gcs_token if split_prefixes else "",
+                "workers": gcs_workers,
+                "resume": gcs_resume is not None,
+            },
+            "Scanning GCS bucket...",
+        )
 
 elif scan_mode == "SSH Git Repo Scan":
     ssh_url = st.text_input("Enter SSH Git URL:", "git@github.com:user/repo.git")
+    branch, incremental = git_scan_options("sshgit")
     if st.button("Scan SSH Repo"):
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_ssh_{ts}.jsonl"
         with st.spinner("Scanning SSH repo..."):
-            cmd = add_common_flags(["trufflehog", "git", ssh_url])
-            records = run_trufflehog(cmd, output_path)
-            save_to_history(scan_mode, records)
+            records = scan_git_repo(
+                scan_mode, ssh_url, branch, incremental, output_path
+            )
 
 elif scan_mode == "Filesystem Scan":
     paths = st.text_input("Enter paths comma-separated:", "/file1.txt,/dir")
+    fs_workers = st.number_input(
+        "Parallel TruffleHog processes:",
+        1,
+        32,
+        min(4, os.cpu_count() or 1),
+        key="fs_workers",
+        help="Files are split into this many shards of similar total size. The "
+        "sidebar concurrency value is the total budget shared between them.",
+    )
+    with st.expander("Pre-walk exclusions"):
+        exclude_exts = st.text_input(
+            "Skip extensions:", FS_EXCLUDE_EXTENSIONS, key="fs_exclude_exts"
+        )
+        exclude_globs = st.text_input(
+            "Skip files and directories matching (comma-separated globs):",
+            FS_EXCLUDE_GLOBS,
+            key="fs_exclude_globs",
+        )
+        max_file_mb = st.number_input(
+            "Skip files larger than (MB, 0 = no limit):",
+            0,
+            1_000_000,
+            100,
+            key="fs_max_file_mb",
+        )
+    skip_unchanged = st.checkbox(
+        "Skip files unchanged since their last scan",
+        value=True,
+        key="fs_skip_unchanged",
+        help="Files with the same size, modification time and inode reuse the "
+        "findings of their last scan with the current detectors.",
+    )
     if st.button("Scan Filesystem"):
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_fs_{ts}.jsonl"
-        with st.spinner("Scanning filesystem..."):
-            items = [p.strip() for p in paths.split(",")]
-            cmd = add_common_flags(["trufflehog", "filesystem"] + items)
-            records = run_trufflehog(cmd, output_path)
-            save_to_history(scan_mode, records)
+        items = [p.strip() for p in paths.split(",") if p.strip()]
+        records, _ = run_profile(
+            scan_mode,
+            ",".join(items),
+            output_path,
+            {
+                "profile": "filesystem",
+                "paths": items,
+                "workers": fs_workers,
+                "exclude_extensions": exclude_exts,
+                "exclude_globs": exclude_globs,
+                "max_file_mb": max_file_mb,
+                "skip_unchanged": skip_unchanged,
+            },
+            "Scanning filesystem...",
+        )
 
 elif scan_mode == "Postman Workspace Scan":
     token = st.text_input("Postman API Token:", "")
@@ -799,21 +1609,10 @@ elif scan_mode == "Postman Workspace Scan":
     if st.button("Scan Postman Workspace"):
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_postman_{ts}.jsonl"
-        with st.spinner("Scanning Postman workspace..."):
-            cmd = add_common_flags(
-                [
-                    "trufflehog",
-                    "postman",
-                    "--token",
-                    token,
-                    "--workspace-id",
-                    ws,
-                    "--collection-id",
-                    coll,
-                ]
-            )
-            records = run_trufflehog(cmd, output_path)
-            save_to_history(scan_mode, records)
+        cmd = add_common_flags(postman_cmd(token, ws, coll))
+        records = launch_scan(
+            scan_mode, ws or coll, output_path, cmd, "Scanning Postman workspace..."
+        )
 
 elif scan_mode == "Jenkins Scan":
     url = st.text_input("Jenkins URL:", "https://jenkins.example.com")
@@ -822,45 +1621,35 @@ elif scan_mode == "Jenkins Scan":
     if st.button("Scan Jenkins Server"):
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_jenkins_{ts}.jsonl"
-        with st.spinner("Scanning Jenkins server..."):
-            cmd = add_common_flags(
-                [
-                    "trufflehog",
-                    "jenkins",
-                    "--url",
-                    url,
-                    "--username",
-                    user,
-                    "--password",
-                    pwd,
-                ]
-            )
-            records = run_trufflehog(cmd, output_path)
-            save_to_history(scan_mode, records)
+        cmd = add_common_flags(jenkins_cmd(url, user, pwd))
+        records = launch_scan(
+            scan_mode, url, output_path, cmd, "Scanning Jenkins server..."
+        )
 
 elif scan_mode == "ElasticSearch Scan":
     nodes = st.text_input("Elasticsearch nodes comma-separated:", "127.0.0.1:9200")
     auth_type = st.selectbox(
         "Auth type:", ["username_password", "service_token", "cloud_id_api_key"]
     )
-    args = ["trufflehog", "elasticsearch"] + nodes.split(",")
     if auth_type == "username_password":
-        u = st.text_input("User:", "")
-        p = st.text_input("Password:", "", type="password")
-        args += ["--username", u, "--password", p]
+        auth = {
+            "username": st.text_input("User:", ""),
+            "password": st.text_input("Password:", "", type="password"),
+        }
     elif auth_type == "service_token":
-        tkn = st.text_input("Service token:", "")
-        args += ["--service-token", tkn]
+        auth = {"service_token": st.text_input("Service token:", "")}
     else:
-        cid = st.text_input("Cloud ID:", "")
-        ak = st.text_input("API Key:", "")
-        args += ["--cloud-id", cid, "--api-key", ak]
+        auth = {
+            "cloud_id": st.text_input("Cloud ID:", ""),
+            "api_key": st.text_input("API Key:", ""),
+        }
     if st.button("Scan Elasticsearch"):
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_es_{ts}.jsonl"
-        cmd = add_common_flags(args)
-        records = run_trufflehog(cmd, output_path)
-        save_to_history(scan_mode, records)
+        cmd = add_common_flags(elasticsearch_cmd(nodes, auth_type, auth))
+        records = launch_scan(
+            scan_mode, nodes, output_path, cmd, "Scanning Elasticsearch..."
+        )
 
 elif scan_mode == "HuggingFace Scan":
     model = st.text_input("Model ID:", "")
@@ -871,20 +1660,14 @@ elif scan_mode == "HuggingFace Scan":
     if st.button("Scan HuggingFace"):
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_hf_{ts}.jsonl"
-        args = ["trufflehog", "huggingface"]
-        if model:
-            args += ["--model", model]
-        if space:
-            args += ["--space", space]
-        if dset:
-            args += ["--dataset", dset]
-        if org:
-            args += ["--org", org]
-        if incl:
-            args += ["--include-discussions", "--include-prs"]
-        cmd = add_common_flags(args)
-        records = run_trufflehog(cmd, output_path)
-        save_to_history(scan_mode, records)
+        cmd = add_common_flags(huggingface_cmd(model, space, dset, org, incl))
+        target = ",".join(x for x in (model, space, dset, org) if x)
+        records = launch_scan(
+            scan_mode, target, output_path, cmd, "Scanning HuggingFace..."
+        )
+
+# Background jobs (polled as a fragment so only this panel refreshes)
+st.fragment(render_jobs_panel, run_every=2 if scan_jobs().active() else None)()
 
 # Store new scan results in session state
 if records is not None:
@@ -894,20 +1677,72 @@ if records is not None:
 if st.session_state.current_results is not None:
     records = st.session_state.current_results
 
-# Display results with filtering
-if records is not None:
+
+# Page buttons move the page before the panel reruns, so no extra rerun is needed
+def turn_page(step):
+    st.session_state.page_number += step
+
+
+# Changing the view, a filter or the page size starts again from page 1
+def reset_page():
+    st.session_state.page_number = 1
+
+
+# Results panel, run as a fragment so paging, filtering and row selection rerun
+# only this panel. Derived data (diff, index) is cached per scan in session state.
+def render_results_panel():
+    started = time.perf_counter()
+    records = st.session_state.current_results
+    if records is None:
+        return
+
+    # Compare with the previous scan of the same target, cached for the scan on
+    # view only
+    scan_diff = None
+    scan_id = st.session_state.current_scan_id
+    if scan_id is not None:
+        cached_diff = st.session_state.get("scan_diff")
+        if cached_diff is None or cached_diff[0] != scan_id:
+            cached_diff = st.session_state.scan_diff = (
+                scan_id,
+                diff_against_previous(scan_id),
+            )
+        scan_diff = cached_diff[1]
+
+    # Display results with filtering
     if not records:
         st.success("✅ No secrets found.")
+        if scan_diff and scan_diff["resolved"]:
+            st.info(
+                f"{len(scan_diff['resolved'])} finding(s) from the previous scan of "
+                "this target are no longer present."
+            )
     else:
-        verified_count = sum(1 for r in records if r.get("Verified", False))
-        unknown_count = len(records) - verified_count
-        detector_count = len(set(r.get("DetectorName", "Unknown") for r in records))
+        diff_aligned = scan_diff is not None and len(scan_diff["fingerprints"]) == len(
+            records
+        )
+        index = result_index(
+            records, scan_diff["fingerprints"] if diff_aligned else None
+        )
+        view_rows = index.all_rows
+        verified_count = len(index.verified_rows)
+        unknown_count = len(index) - verified_count
+        detector_count = len(index.detectors)
 
         metric_col1, metric_col2, metric_col3 = st.columns(3)
         with metric_col1:
-            render_metric_card(
-                "Total findings", len(records), "All findings returned by TruffleHog"
-            )
+            if index.aggregated:
+                render_metric_card(
+                    "Unique secrets",
+                    len(records),
+                    f"Found in {int(index.occurrences.sum())} place(s)",
+                )
+            else:
+                render_metric_card(
+                    "Total findings",
+                    len(records),
+                    "All findings returned by TruffleHog",
+                )
         with metric_col2:
             render_metric_card(
                 "Verified secrets", verified_count, "Confirmed active credentials"
@@ -926,6 +1761,57 @@ if records is not None:
                 f"{unknown_count} unknown finding(s) need validation before closing the scan."
             )
 
+        # Changes since the previous scan of this target
+        change_view = "All findings"
+        if diff_aligned:
+            st.markdown(
+                f"**Compared with previous scan #{scan_diff['previous_scan_id']} "
+                "of this target:**"
+            )
+            diff_col1, diff_col2, diff_col3 = st.columns(3)
+            with diff_col1:
+                render_metric_card(
+                    "New", len(scan_diff["new"]), "Not seen in the previous scan"
+                )
+            with diff_col2:
+                render_metric_card(
+                    "Still present",
+                    len(scan_diff["still_present"]),
+                    "Reported by both scans",
+                )
+            with diff_col3:
+                render_metric_card(
+                    "Resolved",
+                    len(scan_diff["resolved"]),
+                    "Gone since the previous scan",
+                )
+            change_view = st.radio(
+                "Show:",
+                ["All findings", "New only", "Still present", "Resolved"],
+                horizontal=True,
+                key="change_view",
+                on_change=reset_page,
+            )
+            if change_view == "New only":
+                view_rows = index.view_rows("new", scan_diff["new"])
+            elif change_view == "Still present":
+                view_rows = index.view_rows("still_present", scan_diff["still_present"])
+            elif change_view == "Resolved":
+                # Read from the previous scan only when this view is opened
+                resolved = st.session_state.get("resolved_records")
+                if resolved is None or resolved[0] != scan_id:
+                    resolved = st.session_state.resolved_records = (
+                        scan_id,
+                        ResultSpool.from_chunks(
+                            iter_scan_findings(
+                                scan_diff["previous_scan_id"],
+                                fingerprints=scan_diff["resolved"],
+                            )
+                        ),
+                    )
+                index = result_index(resolved[1], key="resolved_index")
+                view_rows = index.all_rows
+
         # Result filtering
         st.markdown("---")
         col1, col2, col3 = st.columns(3)
@@ -935,17 +1821,17 @@ if records is not None:
                 "Filter by Verification:",
                 ["Verified", "Unverified"],
                 default=["Verified", "Unverified"],
+                on_change=reset_page,
             )
 
         with col2:
-            detector_names = sorted(
-                list(set(r.get("DetectorName", "Unknown") for r in records))
-            )
+            detector_names = index.detectors_in(view_rows)
             filter_detector = st.multiselect(
                 "Filter by Detector:",
                 options=detector_names,
                 default=detector_names,  # All selected by default
                 help="Select one or more detector types to filter results",
+                on_change=reset_page,
             )
 
         with col3:
@@ -955,60 +1841,39 @@ if records is not None:
                 help="Keep disabled for screenshots or demos. Exports still contain raw values.",
             )
             st.markdown("**Export Results:**")
-            export_col1, export_col2 = st.columns(2)
-
-        # Apply filters
-        filtered_records = records
-
-        # Filter by verification status
-        if len(filter_verified) > 0 and len(filter_verified) < 2:
-            # Only one option selected
-            if "Verified" in filter_verified:
-                filtered_records = [
-                    r for r in filtered_records if r.get("Verified", False)
-                ]
-            else:  # Only "Unverified" selected
-                filtered_records = [
-                    r for r in filtered_records if not r.get("Verified", False)
-                ]
-        # If both or neither selected, show all records
-
-        # Filter by detector type
-        if len(filter_detector) > 0:
-            filtered_records = [
-                r
-                for r in filtered_records
-                if r.get("DetectorName", "Unknown") in filter_detector
-            ]
-
-        # Reset to page 1 if filters changed
-        if "last_filter_state" not in st.session_state:
-            st.session_state.last_filter_state = (filter_verified, filter_detector)
-
-        current_filter_state = (tuple(filter_verified), tuple(filter_detector))
-        if st.session_state.last_filter_state != current_filter_state:
-            st.session_state.page_number = 1
-            st.session_state.last_filter_state = current_filter_state
+            export_col1, export_col2, export_col3 = st.columns(3)
+
+        # Apply filters (vectorised over the index arrays)
+        filtered_rows = index.select(
+            view_rows,
+            verified=(
+                filter_verified[0] == "Verified" if len(filter_verified) == 1 else None
+            ),
+            detectors=filter_detector or None,
+        )
 
         # Pagination settings
         results_per_page = st.selectbox(
             "Results per page:",
-            options=[10, 25, 50, 100, 200],
-            index=2,  # Default to 50
+            options=[50, 100, 200, 500, 1000],
+            index=2,  # Default to 200
             help="Select how many results to display per page",
+            on_change=reset_page,
         )
 
-        total_results = len(filtered_records)
+        total_results = len(filtered_rows)
         total_pages = (total_results + results_per_page - 1) // results_per_page
 
-        # Initialize page number in session state
+        # Initialize page number in session state; a newly loaded (smaller)
+        # result set can leave it past the last page
         if "page_number" not in st.session_state:
             st.session_state.page_number = 1
-
-        st.subheader(
-            f"Scan Results (Showing {len(filtered_records)} of {len(records)})"
+        st.session_state.page_number = min(
+            st.session_state.page_number, max(total_pages, 1)
         )
 
+        st.subheader(f"Scan Results (Showing {total_results} of {len(view_rows)})")
+
         # Add verification status explanation
         with st.expander("ℹ️ Understanding Results", expanded=False):
             st.markdown("""
@@ -1021,107 +1886,180 @@ if records is not None:
             **Source** - Where the secret was found (e.g., file path, repository, URL)
             """)
 
-        # Create summary dataframe for current page
+        # One virtualised grid for the page; full details only for the selected row
         start_idx = (st.session_state.page_number - 1) * results_per_page
         end_idx = min(start_idx + results_per_page, total_results)
-        current_page_records = filtered_records[start_idx:end_idx]
-
-        # Display results with expandable details
-        for i, r in enumerate(current_page_records, start=start_idx):
-            verified = r.get("Verified", False)
-            verified_status = "VERIFIED ✅" if verified else "Unverified ⚠️"
-            detector = r.get("DetectorName", "Unknown")
-            source = r.get("SourceName", "")
-
-            # Create human-readable summary
-            summary = (
-                f"#{i + 1} — {verified_status} — {detector} secret — Source: {source}"
+        current_page_records = index.take(filtered_rows[start_idx:end_idx])
+
+        grid = pd.DataFrame(
+            [finding_row(r) for r in current_page_records],
+            index=pd.RangeIndex(start_idx + 1, end_idx + 1, name="#"),
+            columns=["Verified", "Detector", "Source", "Secret"],
+        )
+        if reveal_secrets:
+            grid["Secret"] = [r.get("Raw", "") for r in current_page_records]
+        if index.aggregated:
+            grid.insert(
+                3,
+                "Seen",
+                [r.get("OccurrenceCount", 1) for r in current_page_records],
+            )
+        selection = st.dataframe(
+            grid,
+            key=f"results_grid_{st.session_state.page_number}",
+            on_select="rerun",
+            selection_mode="single-row",
+            width="stretch",
+        )
+
+        selected = [
+            p for p in selection.selection.rows if p < len(current_page_records)
+        ]
+        if selected:
+            position = selected[0]
+            r = current_page_records[position]
+            verified_status = (
+                "VERIFIED ✅" if r.get("Verified", False) else "Unverified ⚠️"
             )
+            st.markdown(f"#### Finding #{start_idx + position + 1}")
+            col1, col2 = st.columns([1, 3])
+
+            with col1:
+                st.markdown("**Details:**")
+                st.write(f"**Detector:** {r.get('DetectorName', 'Unknown')}")
+                st.write(f"**Verified:** {verified_status}")
+                st.write(f"**Source:** {r.get('SourceName', '')}")
+                if r.get("SourceType"):
+                    st.write(f"**Source Type:** {r.get('SourceType')}")
+
+            with col2:
+                raw_value = r.get("Raw", "")
+                raw_v2_value = r.get("RawV2", "")
+                st.markdown("**Secret Value:**")
+                if reveal_secrets:
+                    st.code(raw_value, language="text")
+                else:
+                    st.code(mask_secret(raw_value), language="text")
+                    st.caption(
+                        "Enable 'Reveal secret values' above to view the full value."
+                    )
 
-            with st.expander(summary, expanded=False):
-                col1, col2 = st.columns([1, 3])
-
-                with col1:
-                    st.markdown("**Details:**")
-                    st.write(f"**Detector:** {detector}")
-                    st.write(f"**Verified:** {verified_status}")
-                    st.write(f"**Source:** {source}")
-                    if r.get("SourceType"):
-                        st.write(f"**Source Type:** {r.get('SourceType')}")
-
-                with col2:
-                    raw_value = r.get("Raw", "")
-                    raw_v2_value = r.get("RawV2", "")
-                    st.markdown("**Secret Value:**")
-                    if reveal_secrets:
-                        st.code(raw_value, language="text")
-                    else:
-                        st.code(mask_secret(raw_value), language="text")
-                        st.caption(
-                            "Enable 'Reveal secret values' above to view the full value."
-                        )
+                if raw_v2_value:
+                    st.markdown("**Additional Data:**")
+                    st.code(
+                        raw_v2_value if reveal_secrets else mask_secret(raw_v2_value),
+                        language="text",
+                    )
 
-                    if raw_v2_value:
-                        st.markdown("**Additional Data:**")
-                        st.code(
-                            (
-                                raw_v2_value
-                                if reveal_secrets
-                                else mask_secret(raw_v2_value)
-                            ),
-                            language="text",
+            if r.get("Occurrences"):
+                with st.expander(
+                    f"Occurrences ({r.get('OccurrenceCount', len(r['Occurrences']))})",
+                    expanded=False,
+                ):
+                    st.dataframe(
+                        pd.DataFrame(
+                            [
+                                {
+                                    "Source": o.get("SourceName", ""),
+                                    "Location": json.dumps(
+                                        o.get("SourceMetadata", {}).get("Data", {}),
+                                        default=str,
+                                    ),
+                                }
+                                for o in r["Occurrences"]
+                            ]
+                        ),
+                        width="stretch",
+                        hide_index=True,
+                    )
+                    if r.get("OccurrenceCount", 0) > len(r["Occurrences"]):
+                        st.caption(
+                            f"Showing the first {len(r['Occurrences'])} occurrences."
                         )
 
-                st.markdown("---")
-                st.markdown("**Full JSON Data:**")
+            with st.expander("Full JSON Data", expanded=False):
                 st.json(r)
+        else:
+            st.caption("Select a row to see the finding's details and full JSON.")
 
         # Pagination controls
         col_prev, col_info, col_next = st.columns([1, 2, 1])
         with col_prev:
-            if st.button("⬅️ Previous", disabled=(st.session_state.page_number == 1)):
-                st.session_state.page_number -= 1
-                st.rerun()
+            st.button(
+                "⬅️ Previous",
+                disabled=(st.session_state.page_number == 1),
+                on_click=turn_page,
+                args=(-1,),
+            )
         with col_info:
             st.markdown(
                 f"**Page {st.session_state.page_number} of {total_pages}** (Showing {start_idx + 1}-{end_idx} of {total_results})"
             )
         with col_next:
-            if st.button(
-                "Next ➡️", disabled=(st.session_state.page_number >= total_pages)
-            ):
-                st.session_state.page_number += 1
-                st.rerun()
-
-        # Export buttons
-        with export_col1:
-            data_json = json.dumps(filtered_records, indent=2)
-            st.download_button(
-                "📥 Download JSON",
-                data_json,
-                f"trufflehog_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-                "application/json",
-                use_container_width=True,
+            st.button(
+                "Next ➡️",
+                disabled=(st.session_state.page_number >= total_pages),
+                on_click=turn_page,
+                args=(1,),
             )
 
-        with export_col2:
-            # Create CSV from filtered records
-            csv_rows = [
-                {
-                    "Verified": "✅" if r.get("Verified") else "❌",
-                    "DetectorName": r.get("DetectorName", ""),
-                    "SourceName": r.get("SourceName", ""),
-                    "SourceType": r.get("SourceType", ""),
-                    "Raw": r.get("Raw", ""),
-                }
-                for r in filtered_records
-            ]
-            csv_df = pd.DataFrame(csv_rows)
-            csv_data = csv_df.to_csv(index=False)
-            st.download_button(
-                "📥 Download CSV",
-                csv_data,
-                f"trufflehog_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                "text/csv",
-                use_container_width=True,
-            )
+        # Export buttons. Nothing is generated until a download is clicked; the
+        # file is then streamed from the history store and cached per filter state.
+        export_scan_id = st.session_state.current_scan_id
+        export_filters = {
+            "verified": (
+                filter_verified[0] == "Verified" if len(filter_verified) == 1 else None
+            ),
+            "detectors": (
+                filter_detector
+                if filter_detector and len(filter_detector) < len(detector_names)
+                else None
+            ),
+            "fingerprints": None,
+        }
+        if change_view == "Resolved":
+            export_scan_id = scan_diff["previous_scan_id"]
+            export_filters["fingerprints"] = scan_diff["resolved"]
+        elif change_view == "New only":
+            export_filters["fingerprints"] = scan_diff["new"]
+        elif change_view == "Still present":
+            export_filters["fingerprints"] = scan_diff["still_present"]
+
+        def export_data(
+            fmt, scan_id=export_scan_id, filters=export_filters, rows=filtered_rows
+        ):
+            # Handed over as file objects for the download handler to read, so
+            # the script never holds its own copy of the export
+            if scan_id is not None:
+                return open(cached_export(scan_id, fmt, **filters), "rb")
+            buffer = io.BytesIO()
+            write_export([index.take(rows)], fmt, buffer)
+            return buffer
+
+        export_stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        for export_col, fmt in zip(
+            (export_col1, export_col2, export_col3), EXPORT_FORMATS
+        ):
+            with export_col:
+                st.download_button(
+                    f"📥 {fmt.upper()}",
+                    lambda fmt=fmt: export_data(fmt),
+                    f"trufflehog_results_{export_stamp}.{fmt}",
+                    EXPORT_FORMATS[fmt],
+                    on_click="ignore",
+                    disabled=fmt == "parquet" and not PARQUET_SUPPORTED,
+                    help=(
+                        "Install pyarrow to enable Parquet export"
+                        if fmt == "parquet" and not PARQUET_SUPPORTED
+                        else None
+                    ),
+                    width="stretch",
+                )
+
+    st.caption(
+        f"⏱️ Results panel rendered in {(time.perf_counter() - started) * 1000:.0f} ms"
+    )
+
+
+st.fragment(render_results_panel)()
+st.caption(f"⏱️ Page rendered in {(time.perf_counter() - page_started) * 1000:.0f} ms")
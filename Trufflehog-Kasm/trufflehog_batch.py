@@ -0,0 +1,233 @@
+"""Run TruffleHog WebUI scans headless from a targets file.
+
+Each line of the targets file is a JSON object naming a scan profile and its
+options, for example:
+
+    {"profile": "git", "repo": "https://github.com/org/app.git", "incremental": true}
+    {"profile": "crawl", "url": "https://example.com", "max_pages": 500}
+    {"profile": "s3", "buckets": ["logs", "backups"], "workers": 4}
+
+Targets run with bounded parallelism, sharing one --concurrency budget. Results
+go to the same history database and JSONL files as the UI, so a nightly sweep
+can be triaged there afterwards. One JSON summary per target is printed to
+stdout as it finishes; progress is logged to stderr.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from trufflehog_engine import (
+    SCANS_STOPPED,
+    SCAN_PROFILES,
+    ScanCancelled,
+    ScanProgress,
+    default_settings,
+    init_history_db,
+    list_detector_profiles,
+    run_target,
+    stop_running_scans,
+)
+
+OUTPUT_DIR = "/home/kasm-user/Desktop/Downloads"
+
+# Seconds between progress lines of a running target
+STATUS_INTERVAL = 10
+
+
+# Logs engine progress to stderr, one prefixed line per update, rate-limited so
+# a long crawl does not flood the log. Once the running scans are stopped, the
+# next status report abandons the target.
+class LogProgress(ScanProgress):
+    lock = threading.Lock()
+
+    def __init__(self, label, quiet=False):
+        self.label = label
+        self.quiet = quiet
+        self.last = 0
+
+    def _log(self, text):
+        with self.lock:
+            print(f"[{self.label}] {text}", file=sys.stderr, flush=True)
+
+    def status(self, text):
+        if SCANS_STOPPED.is_set():
+            raise ScanCancelled()
+        if not self.quiet and time.monotonic() - self.last >= STATUS_INTERVAL:
+            self.last = time.monotonic()
+            self._log(text)
+
+    def metrics(self, values):
+        self.status(", ".join(f"{name}: {value}" for name, value in values.items()))
+
+    def notice(self, level, text):
+        if level in ("warning", "error") or not self.quiet:
+            self._log(text if level == "text" else f"{level}: {text}")
+
+
+# Read and validate the targets file; exits with the offending line on error
+def read_targets(parser, path):
+    targets = []
+    with sys.stdin if path == "-" else open(path) as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                spec = json.loads(line)
+            except ValueError as e:
+                parser.error(f"{path}:{line_no}: invalid JSON ({e})")
+            if not isinstance(spec, dict) or spec.get("profile") not in SCAN_PROFILES:
+                parser.error(
+                    f"{path}:{line_no}: 'profile' must be one of "
+                    f"{', '.join(SCAN_PROFILES)}"
+                )
+            missing = [k for k in SCAN_PROFILES[spec["profile"]][2] if k not in spec]
+            if missing:
+                parser.error(f"{path}:{line_no}: missing {', '.join(missing)}")
+            targets.append((line_no, spec))
+    return targets
+
+
+def build_settings(parser, args):
+    detectors = {"all": True, "categories": [], "include": "", "exclude": ""}
+    if args.detector_profile:
+        profiles = list_detector_profiles()
+        if args.detector_profile not in profiles:
+            parser.error(f"no saved detector profile '{args.detector_profile}'")
+        detectors = profiles[args.detector_profile]
+    if args.include_detectors:
+        detectors = dict(detectors, include=args.include_detectors)
+    if args.exclude_detectors:
+        detectors = dict(detectors, exclude=args.exclude_detectors)
+    return default_settings(
+        # Every parallel target gets an equal share of the budget
+        concurrency=max(1, args.concurrency // args.parallel),
+        git_clone_timeout=args.git_clone_timeout,
+        detectors=detectors,
+        verify=(
+            {
+                "workers": args.verification_workers,
+                "ttl_seconds": args.verification_ttl_hours * 3600,
+            }
+            if args.two_phase
+            else None
+        ),
+        aggregate=not args.no_aggregate,
+    )
+
+
+def scan_one(line_no, spec, settings, args, stamp):
+    label = f"{line_no}:{spec['profile']}"
+    tag = SCAN_PROFILES[spec["profile"]][1]
+    output_path = os.path.join(
+        args.output_dir, f"trufflehog_{tag}_{stamp}_{line_no:03d}.jsonl"
+    )
+    progress = LogProgress(label, args.quiet)
+    progress.notice("text", "started")
+    started = time.monotonic()
+    summary = {"line": line_no, "profile": spec["profile"], "output": output_path}
+    try:
+        records, scan_id, problems = run_target(spec, output_path, settings, progress)
+    except ScanCancelled:
+        summary.update(state="cancelled")
+    except Exception as e:
+        progress.notice("error", str(e))
+        summary.update(state="failed", error=str(e))
+    else:
+        summary.update(
+            state="failed" if problems else "done",
+            scan_id=scan_id,
+            findings=len(records),
+            verified=sum(1 for r in records if r.get("Verified")),
+        )
+        if problems:
+            summary["error"] = "; ".join(p[-300:] for p in problems)
+    summary["seconds"] = round(time.monotonic() - started, 1)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run TruffleHog WebUI scan profiles headless from a targets "
+        "file (JSON Lines, one target per line).",
+        epilog=f"Profiles: {', '.join(SCAN_PROFILES)}",
+    )
+    parser.add_argument("targets", help="targets file, or - for stdin")
+    parser.add_argument(
+        "-j",
+        "--parallel",
+        type=int,
+        default=2,
+        help="targets scanned at once (default: 2)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="total trufflehog --concurrency budget, split between the parallel "
+        "targets (default: 8)",
+    )
+    parser.add_argument(
+        "--git-clone-timeout",
+        type=int,
+        default=0,
+        help="seconds; 0 = no timeout",
+    )
+    parser.add_argument("--detector-profile", help="detector profile saved from the UI")
+    parser.add_argument("--include-detectors", help="comma-separated detector names")
+    parser.add_argument("--exclude-detectors", help="comma-separated detector names")
+    parser.add_argument(
+        "--two-phase",
+        action="store_true",
+        help="detect without verification, then verify each distinct secret once",
+    )
+    parser.add_argument("--verification-workers", type=int, default=4)
+    parser.add_argument("--verification-ttl-hours", type=int, default=24)
+    parser.add_argument(
+        "--no-aggregate",
+        action="store_true",
+        help="store one finding per location instead of grouping identical secrets",
+    )
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument(
+        "-q", "--quiet", action="store_true", help="log only warnings and errors"
+    )
+    args = parser.parse_args(argv)
+    if args.parallel < 1 or args.concurrency < 1:
+        parser.error("--parallel and --concurrency must be at least 1")
+
+    init_history_db()
+    targets = read_targets(parser, args.targets)
+    settings = build_settings(parser, args)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    failures = 0
+    pool = ThreadPoolExecutor(max_workers=args.parallel, thread_name_prefix="target")
+    try:
+        futures = [
+            pool.submit(scan_one, line_no, spec, settings, args, stamp)
+            for line_no, spec in targets
+        ]
+        for future in as_completed(futures):
+            summary = future.result()
+            failures += summary["state"] != "done"
+            print(json.dumps(summary), flush=True)
+    except KeyboardInterrupt:
+        # trufflehog runs in its own session and misses the terminal's Ctrl-C.
+        # Interrupted crawls and bucket scans stay resumable ("resume": true).
+        print("Interrupted; stopping running scans...", file=sys.stderr)
+        stop_running_scans()
+        pool.shutdown(wait=True, cancel_futures=True)
+        sys.exit(130)
+    pool.shutdown()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
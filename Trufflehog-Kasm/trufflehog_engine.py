@@ -0,0 +1,3096 @@
+"""Scan engine shared by the TruffleHog WebUI and the batch command line.
+
+Nothing here touches Streamlit: scans are configured with a plain settings dict
+and report through a ScanProgress, so the same scan profiles run from the UI,
+its background jobs and trufflehog_batch.py, writing to the same history
+database and JSONL files.
+"""
+
+import csv
+import fnmatch
+import functools
+import hashlib
+import heapq
+import io
+import json
+import os
+import random
+import re
+import shutil
+import signal
+import sqlite3
+import stat
+import subprocess
+import tempfile
+import threading
+import time
+import weakref
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from queue import Empty, Queue
+from urllib.parse import (
+    parse_qsl,
+    quote,
+    urlencode,
+    urljoin,
+    urlparse,
+    urlsplit,
+    urlunsplit,
+)
+
+import requests
+import tldextract
+from bs4 import BeautifulSoup
+
+try:  # Parquet export is optional
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+PARQUET_SUPPORTED = pq is not None
+
+
+# Scan history database, plus the legacy JSON file it replaced
+HISTORY_DB = os.path.expanduser("~/trufflehog_scan_history.db")
+HISTORY_FILE = os.path.expanduser("~/trufflehog_scan_history.json")
+
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    target TEXT NOT NULL DEFAULT '',
+    count INTEGER NOT NULL DEFAULT 0,
+    verified_count INTEGER NOT NULL DEFAULT 0,
+    aggregated INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS findings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    scan_id INTEGER NOT NULL REFERENCES scans(id) ON DELETE CASCADE,
+    detector TEXT NOT NULL,
+    verified INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    fingerprint TEXT NOT NULL DEFAULT '',
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_scans_timestamp ON scans(timestamp);
+CREATE INDEX IF NOT EXISTS idx_scans_target ON scans(mode, target);
+CREATE INDEX IF NOT EXISTS idx_findings_scan ON findings(scan_id);
+CREATE INDEX IF NOT EXISTS idx_findings_detector ON findings(detector);
+CREATE INDEX IF NOT EXISTS idx_findings_verified ON findings(verified);
+CREATE INDEX IF NOT EXISTS idx_findings_source ON findings(source);
+CREATE INDEX IF NOT EXISTS idx_findings_timestamp ON findings(timestamp);
+CREATE INDEX IF NOT EXISTS idx_findings_fingerprint ON findings(scan_id, fingerprint);
+CREATE TABLE IF NOT EXISTS detector_profiles (
+    name TEXT PRIMARY KEY,
+    config TEXT NOT NULL,
+    updated TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS verification_cache (
+    secret_key TEXT PRIMARY KEY,
+    detector TEXT NOT NULL,
+    verified INTEGER NOT NULL,
+    verification_error TEXT,
+    checked_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS git_watermarks (
+    repo TEXT NOT NULL,
+    branch TEXT NOT NULL,
+    head_commit TEXT NOT NULL,
+    scan_id INTEGER REFERENCES scans(id) ON DELETE SET NULL,
+    updated TEXT NOT NULL,
+    PRIMARY KEY (repo, branch)
+);
+CREATE TABLE IF NOT EXISTS crawls (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    start_url TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    output_path TEXT NOT NULL,
+    state TEXT NOT NULL,
+    updated TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS crawl_frontier (
+    crawl_id INTEGER NOT NULL REFERENCES crawls(id) ON DELETE CASCADE,
+    url TEXT NOT NULL,
+    depth INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'queued',
+    PRIMARY KEY (crawl_id, url)
+);
+CREATE INDEX IF NOT EXISTS idx_crawl_frontier_state
+    ON crawl_frontier(crawl_id, state, depth);
+CREATE TABLE IF NOT EXISTS http_cache (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    content_hash TEXT NOT NULL,
+    links TEXT,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS content_scans (
+    content_hash TEXT NOT NULL,
+    detector_key TEXT NOT NULL,
+    findings TEXT NOT NULL,
+    scanned_at REAL NOT NULL,
+    PRIMARY KEY (content_hash, detector_key)
+);
+CREATE TABLE IF NOT EXISTS bucket_scans (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    mode TEXT NOT NULL,
+    target TEXT NOT NULL,
+    output_path TEXT NOT NULL,
+    state TEXT NOT NULL,
+    updated TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bucket_shards (
+    run_id INTEGER NOT NULL REFERENCES bucket_scans(id) ON DELETE CASCADE,
+    shard TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'queued',
+    findings INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (run_id, shard)
+);
+CREATE TABLE IF NOT EXISTS file_scans (
+    path TEXT NOT NULL,
+    detector_key TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    findings TEXT NOT NULL,
+    scanned_at REAL NOT NULL,
+    PRIMARY KEY (path, detector_key)
+);
+"""
+
+
+# Open a connection to the history database (one per caller; safe across threads)
+def history_db():
+    conn = sqlite3.connect(HISTORY_DB, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+
+# Hash of the secret material itself, independent of where it was found
+def secret_hash(record):
+    material = f"{record.get('Raw', '')}\0{record.get('RawV2', '')}"
+    return hashlib.sha256(material.encode("utf-8", "replace")).hexdigest()
+
+
+# Stable identity of a finding across scans: detector + secret + source location.
+# Aggregated findings stand for every location of a secret, so they omit it;
+# scans are therefore only diffed against scans of the same form.
+def finding_fingerprint(record):
+    location = record.get("SourceMetadata", {}).get("Data", {})
+    location = {
+        kind: {k: v for k, v in (meta or {}).items() if k != "timestamp"}
+        for kind, meta in location.items()
+        if isinstance(meta, dict) or meta is None
+    }
+    if "Occurrences" in record:
+        location = None
+    key = "|".join(
+        (
+            record.get("DetectorName", "Unknown"),
+            secret_hash(record),
+            json.dumps(location, sort_keys=True, default=str),
+        )
+    )
+    return hashlib.sha256(key.encode("utf-8", "replace")).hexdigest()
+
+
+# Append one scan and its findings in a single transaction; returns the scan id
+def insert_scan(conn, timestamp, mode, target, records, aggregated=False):
+    verified_count = sum(1 for r in records if r.get("Verified", False))
+    cur = conn.execute(
+        "INSERT INTO scans (timestamp, mode, target, count, verified_count, "
+        "aggregated) VALUES (?, ?, ?, ?, ?, ?)",
+        (timestamp, mode, target, len(records), verified_count, int(aggregated)),
+    )
+    scan_id = cur.lastrowid
+    conn.executemany(
+        "INSERT INTO findings "
+        "(scan_id, detector, verified, source, timestamp, fingerprint, record) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (
+            (
+                scan_id,
+                r.get("DetectorName", "Unknown"),
+                int(bool(r.get("Verified", False))),
+                r.get("SourceName", ""),
+                timestamp,
+                finding_fingerprint(r),
+                json.dumps(r),
+            )
+            for r in records
+        ),
+    )
+    return scan_id
+
+
+# Move scans from the old JSON history file into the database, once
+def import_legacy_history(conn):
+    if not os.path.exists(HISTORY_FILE):
+        return
+    try:
+        with open(HISTORY_FILE, "r") as f:
+            legacy = json.load(f)
+    except (OSError, ValueError, sqlite3.Error):
+        legacy = []
+    with conn:
+        for scan in legacy:
+            insert_scan(
+                conn,
+                scan.get("timestamp", ""),
+                scan.get("mode", ""),
+                "",
+                scan.get("results", []),
+            )
+    os.replace(HISTORY_FILE, HISTORY_FILE + ".imported")
+
+
+# Bring databases created before fingerprinting up to the current schema
+def migrate_history_db(conn):
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(findings)")}
+    if columns and "fingerprint" not in columns:
+        conn.execute(
+            "ALTER TABLE findings ADD COLUMN fingerprint TEXT NOT NULL DEFAULT ''"
+        )
+        rows = conn.execute("SELECT id, record FROM findings").fetchall()
+        conn.executemany(
+            "UPDATE findings SET fingerprint = ? WHERE id = ?",
+            ((finding_fingerprint(json.loads(r["record"])), r["id"]) for r in rows),
+        )
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(scans)")}
+    if columns and "aggregated" not in columns:
+        conn.execute(
+            "ALTER TABLE scans ADD COLUMN aggregated INTEGER NOT NULL DEFAULT 0"
+        )
+        # Aggregated scans store an occurrence list on every finding
+        conn.execute(
+            "UPDATE scans SET aggregated = 1 WHERE (SELECT record LIKE "
+            "'%\"OccurrenceCount\"%' FROM findings WHERE scan_id = scans.id "
+            "ORDER BY id LIMIT 1)"
+        )
+
+
+# Create the schema and import legacy history. Idempotent; the UI runs it once
+# per server process and batch runs once per invocation.
+def init_history_db():
+    with history_db() as conn:
+        conn.execute("PRAGMA journal_mode = WAL")
+        migrate_history_db(conn)
+        conn.executescript(HISTORY_SCHEMA)
+        import_legacy_history(conn)
+    return True
+
+
+# Most recent scans for the sidebar (metadata only, no findings)
+def recent_scans(limit=10):
+    with history_db() as conn:
+        return conn.execute(
+            "SELECT id, timestamp, mode, target, count FROM scans "
+            "ORDER BY id DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+
+
+# Where result spools without an output file of their own are kept
+SPOOL_DIR = os.path.expanduser("~/.cache/trufflehog_spool")
+
+# Parsed records kept in memory per spool
+SPOOL_WINDOW_ROWS = 1000
+
+
+# Findings spooled to a JSONL file. Only the byte offset of each line and a
+# bounded window of parsed records stay in memory, so a scan's footprint does
+# not grow with its result count. Reads like a list of records.
+class ResultSpool:
+    def __init__(self, path=None, existing=False):
+        if path is None:
+            os.makedirs(SPOOL_DIR, exist_ok=True)
+            fd, path = tempfile.mkstemp(
+                prefix="results_", suffix=".jsonl", dir=SPOOL_DIR
+            )
+            os.close(fd)
+            weakref.finalize(self, remove_file, path)
+        elif os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.offsets = array("q")
+        self.lock = threading.Lock()
+        if existing and os.path.exists(path):
+            self._index_existing()
+        self._writer = open(path, "ab")
+        self._end = self._writer.tell()
+        if not existing:
+            self._start = self._end
+        self._reader = None
+        self._window = OrderedDict()
+
+    @classmethod
+    def from_chunks(cls, chunks, path=None):
+        spool = cls(path)
+        for chunk in chunks:
+            spool.extend(chunk)
+        return spool
+
+    # Adopt the records already in the file (e.g. when resuming a crawl), dropping
+    # a trailing line cut short by an interruption
+    def _index_existing(self):
+        self._start = end = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                if line.strip():
+                    self.offsets.append(end)
+                end += len(line)
+        if end != os.path.getsize(self.path):
+            os.truncate(self.path, end)
+
+    def flush(self):
+        with self.lock:
+            self._writer.flush()
+
+    def append(self, record):
+        line = (json.dumps(record) + "\n").encode("utf-8")
+        with self.lock:
+            self.offsets.append(self._end)
+            self._writer.write(line)
+            self._end += len(line)
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("spool index out of range")
+        if i in self._window:
+            self._window.move_to_end(i)
+            return self._window[i]
+        with self.lock:
+            self._writer.flush()
+            if self._reader is None:
+                self._reader = open(self.path, "rb")
+            self._reader.seek(self.offsets[i])
+            record = json.loads(self._reader.readline())
+        self._window[i] = record
+        if len(self._window) > SPOOL_WINDOW_ROWS:
+            self._window.popitem(last=False)
+        return record
+
+    def __iter__(self):
+        count = len(self)
+        with self.lock:
+            self._writer.flush()
+        with open(self.path, "rb") as f:
+            f.seek(self._start)
+            while count:
+                line = f.readline()
+                if line.strip():
+                    count -= 1
+                    yield json.loads(line)
+
+    def rewrite(self, update, keep=None):
+        """Apply update() to every record, rewriting the spool file in place.
+
+        Records for which keep() is false after the update are dropped.
+        """
+        partial = f"{self.path}.rewrite"
+        offsets = array("q")
+        with open(partial, "wb") as out_f:
+            with open(self.path, "rb") as f:
+                out_f.write(f.read(self._start))
+            for record in self:
+                update(record)
+                if keep is not None and not keep(record):
+                    continue
+                offsets.append(out_f.tell())
+                out_f.write((json.dumps(record) + "\n").encode("utf-8"))
+            end = out_f.tell()
+        with self.lock:
+            self._writer.close()
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+            os.replace(partial, self.path)
+            self._writer = open(self.path, "ab")
+            self.offsets, self._end = offsets, end
+            self._window.clear()
+
+
+def remove_file(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+# Load one scan's findings on demand, spooled to disk rather than held in memory
+def load_scan_findings(scan_id):
+    return ResultSpool.from_chunks(iter_scan_findings(scan_id))
+
+
+# Compare a scan with the previous scan of the same mode and target, stored in
+# the same (aggregated or per-location) form. Only fingerprints are loaded, into
+# sets so every lookup is O(1); resolved findings are read from the previous
+# scan on demand (iter_scan_findings with fingerprints=diff["resolved"]).
+def diff_against_previous(scan_id):
+    with history_db() as conn:
+        previous = conn.execute(
+            "SELECT p.id FROM scans s JOIN scans p "
+            "ON p.mode = s.mode AND p.target = s.target "
+            "AND p.aggregated = s.aggregated AND p.id < s.id "
+            "WHERE s.id = ? AND s.target != '' ORDER BY p.id DESC LIMIT 1",
+            (scan_id,),
+        ).fetchone()
+        if previous is None:
+            return None
+        fingerprints = [
+            row["fingerprint"]
+            for row in conn.execute(
+                "SELECT fingerprint FROM findings WHERE scan_id = ? ORDER BY id",
+                (scan_id,),
+            )
+        ]
+        previous_fingerprints = {
+            row["fingerprint"]
+            for row in conn.execute(
+                "SELECT fingerprint FROM findings WHERE scan_id = ?",
+                (previous["id"],),
+            )
+        }
+    current = set(fingerprints)
+    return {
+        "previous_scan_id": previous["id"],
+        "fingerprints": fingerprints,  # aligned with load_scan_findings order
+        "new": current - previous_fingerprints,
+        "still_present": current & previous_fingerprints,
+        "resolved": previous_fingerprints - current,
+    }
+
+
+# Last scanned HEAD of a repo/branch, with the scan that recorded it
+def get_git_watermark(repo, branch):
+    with history_db() as conn:
+        return conn.execute(
+            "SELECT head_commit, scan_id FROM git_watermarks "
+            "WHERE repo = ? AND branch = ?",
+            (repo, branch),
+        ).fetchone()
+
+
+def set_git_watermark(repo, branch, head_commit, scan_id):
+    with history_db() as conn:
+        conn.execute(
+            "INSERT INTO git_watermarks (repo, branch, head_commit, scan_id, updated) "
+            "VALUES (?, ?, ?, ?, ?) ON CONFLICT (repo, branch) DO UPDATE SET "
+            "head_commit = excluded.head_commit, scan_id = excluded.scan_id, "
+            "updated = excluded.updated",
+            (
+                repo,
+                branch,
+                head_commit,
+                scan_id,
+                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            ),
+        )
+
+
+# Named detector selections, reusable across scans
+def list_detector_profiles():
+    with history_db() as conn:
+        return {
+            row["name"]: json.loads(row["config"])
+            for row in conn.execute(
+                "SELECT name, config FROM detector_profiles ORDER BY name"
+            )
+        }
+
+
+def save_detector_profile(name, config):
+    with history_db() as conn:
+        conn.execute(
+            "INSERT INTO detector_profiles (name, config, updated) VALUES (?, ?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET config = excluded.config, "
+            "updated = excluded.updated",
+            (name, json.dumps(config), datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+        )
+
+
+# Exports are generated on demand, streamed from the history store in chunks and
+# cached on disk per (scan, filters, format) so repeat downloads are free.
+EXPORT_CACHE_DIR = os.path.expanduser("~/.cache/trufflehog_exports")
+EXPORT_CHUNK_ROWS = 1000
+EXPORT_FORMATS = {
+    "json": "application/json",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+CSV_EXPORT_COLUMNS = [
+    "Verified",
+    "DetectorName",
+    "SourceName",
+    "SourceType",
+    "Raw",
+    "Occurrences",
+]
+PARQUET_EXPORT_COLUMNS = [
+    "DetectorName",
+    "DecoderName",
+    "SourceName",
+    "SourceType",
+    "Raw",
+    "RawV2",
+    "Redacted",
+    "SourceMetadata",
+    "ExtraData",
+    "Occurrences",
+]
+
+
+# Yield a scan's findings in chunks, filtered in SQL where possible
+def iter_scan_findings(
+    scan_id, verified=None, detectors=None, fingerprints=None, chunk_rows=None
+):
+    sql = "SELECT fingerprint, record FROM findings WHERE scan_id = ?"
+    params = [scan_id]
+    if verified is not None:
+        sql += " AND verified = ?"
+        params.append(int(verified))
+    if detectors:
+        sql += f" AND detector IN ({', '.join('?' * len(detectors))})"
+        params.extend(detectors)
+    with history_db() as conn:
+        cursor = conn.execute(sql + " ORDER BY id", params)
+        while rows := cursor.fetchmany(chunk_rows or EXPORT_CHUNK_ROWS):
+            yield [
+                json.loads(row["record"])
+                for row in rows
+                if fingerprints is None or row["fingerprint"] in fingerprints
+            ]
+
+
+def csv_export_row(record):
+    return {
+        "Verified": "✅" if record.get("Verified") else "❌",
+        "DetectorName": record.get("DetectorName", ""),
+        "SourceName": record.get("SourceName", ""),
+        "SourceType": record.get("SourceType", ""),
+        "Raw": record.get("Raw", ""),
+        "Occurrences": record.get("OccurrenceCount", 1),
+    }
+
+
+def parquet_export_row(record):
+    row = {"Verified": bool(record.get("Verified"))}
+    for column in PARQUET_EXPORT_COLUMNS:
+        value = record.get(column)
+        if value is not None and not isinstance(value, str):
+            value = json.dumps(value) if isinstance(value, (dict, list)) else str(value)
+        row[column] = value
+    return row
+
+
+# Write chunks of records to a binary stream without holding them all at once
+def write_export(chunks, fmt, stream):
+    if fmt == "json":
+        text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+        text.write("[")
+        first = True
+        for chunk in chunks:
+            for record in chunk:
+                text.write("\n" if first else ",\n")
+                text.write(json.dumps(record, indent=2))
+                first = False
+        text.write("\n]" if not first else "]")
+        text.detach()
+    elif fmt == "csv":
+        text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+        writer = csv.DictWriter(
+            text, fieldnames=CSV_EXPORT_COLUMNS, lineterminator="\n"
+        )
+        writer.writeheader()
+        for chunk in chunks:
+            writer.writerows(csv_export_row(r) for r in chunk)
+        text.detach()
+    elif fmt == "parquet":
+        if pq is None:
+            raise RuntimeError("Parquet export requires pyarrow")
+        schema = pa.schema(
+            [("Verified", pa.bool_())]
+            + [(column, pa.string()) for column in PARQUET_EXPORT_COLUMNS]
+        )
+        with pq.ParquetWriter(stream, schema) as writer:
+            for chunk in chunks:
+                if chunk:
+                    writer.write_table(
+                        pa.Table.from_pylist(
+                            [parquet_export_row(r) for r in chunk], schema=schema
+                        )
+                    )
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+
+# Path of a scan export, generating it from the history store on first request
+def cached_export(scan_id, fmt, verified=None, detectors=None, fingerprints=None):
+    key = hashlib.sha256(
+        json.dumps(
+            [
+                scan_id,
+                fmt,
+                verified,
+                sorted(detectors or []),
+                sorted(fingerprints) if fingerprints is not None else None,
+            ]
+        ).encode()
+    ).hexdigest()[:16]
+    path = os.path.join(EXPORT_CACHE_DIR, f"scan{scan_id}_{key}.{fmt}")
+    if not os.path.exists(path):
+        os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+        partial = f"{path}.{threading.get_ident()}.part"
+        try:
+            with open(partial, "wb") as f:
+                write_export(
+                    iter_scan_findings(scan_id, verified, detectors, fingerprints),
+                    fmt,
+                    f,
+                )
+            os.replace(partial, path)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+    return path
+
+
+# Drop every stored scan and finding, and the exports generated from them
+def clear_history():
+    with history_db() as conn:
+        conn.execute("DELETE FROM findings")
+        conn.execute("DELETE FROM git_watermarks")
+        conn.execute("DELETE FROM crawls")
+        conn.execute("DELETE FROM bucket_scans")
+        conn.execute("DELETE FROM http_cache")
+        conn.execute("DELETE FROM content_scans")
+        conn.execute("DELETE FROM file_scans")
+        conn.execute("DELETE FROM scans")
+    shutil.rmtree(EXPORT_CACHE_DIR, ignore_errors=True)
+
+
+DETECTOR_CATEGORIES = {
+    "cloud": "Cloud Providers (AWS, Azure, GCP)",
+    "vcs": "Version Control (GitHub, GitLab)",
+    "database": "Databases (MongoDB, MySQL, PostgreSQL)",
+    "api": "API Keys & Tokens",
+    "crypto": "Private Keys & Certificates",
+}
+# TruffleHog detector names per category. "api" is the catch-all for every
+# detector not listed here, so it is expressed by excluding the others.
+CATEGORY_DETECTORS = {
+    "cloud": [
+        "AWS",
+        "AWSSessionKey",
+        "Azure",
+        "AzureBatch",
+        "AzureContainerRegistry",
+        "GCP",
+        "GCPApplicationDefaultCredentials",
+        "DigitalOceanToken",
+        "DigitalOceanV2",
+        "Heroku",
+        "CloudflareApiToken",
+        "CloudflareCaKey",
+        "CloudflareGlobalApiKey",
+    ],
+    "vcs": ["Github", "GitHubApp", "GitHubOauth2", "Gitlab"],
+    "database": [
+        "MongoDB",
+        "Postgres",
+        "JDBC",
+        "Redis",
+        "SQLServer",
+        "PlanetScale",
+        "PlanetScaleDb",
+    ],
+    "crypto": ["PrivateKey"],
+}
+
+
+# Turn a detector profile into --include-detectors / --exclude-detectors flags
+def detector_flags(profile):
+    include = option_list(profile.get("include", ""))
+    exclude = option_list(profile.get("exclude", ""))
+    if not profile.get("all", True):
+        categories = profile.get("categories", [])
+        if "api" in categories:
+            # Everything except the unticked named categories
+            for category, names in CATEGORY_DETECTORS.items():
+                if category not in categories:
+                    exclude += [n for n in names if n not in include]
+            include = []
+        else:
+            include = [
+                n for c in categories for n in CATEGORY_DETECTORS.get(c, [])
+            ] + include
+    flags = []
+    if include:
+        flags.append(f"--include-detectors={','.join(dict.fromkeys(include))}")
+    if exclude:
+        flags.append(f"--exclude-detectors={','.join(dict.fromkeys(exclude))}")
+    return flags
+
+
+# Scan settings, built from the sidebar by the UI and from arguments by the
+# batch CLI. verify holds the two-phase verification settings (workers,
+# ttl_seconds), or None when trufflehog verifies inline.
+DEFAULT_SETTINGS = {
+    "concurrency": 8,
+    "git_clone_timeout": 0,
+    "detectors": {"all": True, "categories": [], "include": "", "exclude": ""},
+    "verify": None,
+    "aggregate": True,
+}
+
+
+def default_settings(**overrides):
+    return {**DEFAULT_SETTINGS, **overrides}
+
+
+# Add the flags every trufflehog invocation shares to a command
+def common_flags(cmd, settings, worker_concurrency=None):
+    if settings["verify"] is not None:  # Phase one: detect only, verify later
+        cmd.extend(["--no-verification", "--results=verified,unknown,unverified"])
+    else:
+        cmd.append("--results=verified,unknown")
+    cmd.extend(["--json", "--no-update"])
+    if worker_concurrency:  # Share of the budget when several processes run
+        cmd.extend(["--concurrency", str(worker_concurrency)])
+    elif settings["concurrency"] != 8:  # Only add if not default
+        cmd.extend(["--concurrency", str(settings["concurrency"])])
+    if settings["git_clone_timeout"] > 0:
+        cmd.extend(["--git-clone-timeout", f"{settings['git_clone_timeout']}s"])
+    cmd.extend(detector_flags(settings["detectors"]))
+    return cmd
+
+
+# Where long-running scans report to. The base class discards everything; the
+# UI draws these into the page and the batch CLI logs them. fraction is 0..1,
+# metrics a {label: value} dict, table a list of row dicts and notice level one
+# of text, info, warning or error.
+class ScanProgress:
+    def status(self, text):
+        pass
+
+    def fraction(self, value):
+        pass
+
+    def metrics(self, values):
+        pass
+
+    def table(self, rows):
+        pass
+
+    def notice(self, level, text):
+        pass
+
+
+# Raised from a progress report to abandon the scan making it: the engine then
+# unwinds through its cleanup, as on a Streamlit stop, and saves nothing.
+# Background jobs raise it once cancelled, the batch CLI once interrupted.
+class ScanCancelled(Exception):
+    pass
+
+
+# Terminate a scan subprocess and everything it spawned
+def kill_process_group(proc, grace_seconds=3):
+    if proc.poll() is not None:
+        return
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait(timeout=grace_seconds)
+    except subprocess.TimeoutExpired:
+        os.killpg(proc.pid, signal.SIGKILL)
+        proc.wait()
+    except ProcessLookupError:
+        pass
+
+
+# Scan subprocesses (trufflehog, gobuster) currently running. They run in their
+# own session, so a terminal Ctrl-C never reaches them; the batch CLI stops them
+# through this.
+# Once stopped, processes started afterwards (e.g. the next queued shard) are
+# killed straight away too.
+RUNNING_SCANS = set()
+SCANS_STOPPED = threading.Event()
+
+
+def stop_running_scans():
+    SCANS_STOPPED.set()
+    for proc in list(RUNNING_SCANS):
+        kill_process_group(proc)
+
+
+# Enough trailing stderr to explain a failure without flooding the page
+STDERR_TAIL_CHARS = 8000
+
+
+# Streaming TruffleHog runner (UI-free). stdout and stderr are drained on their
+# own threads so a chatty stderr can never fill its pipe and stall the scan.
+def stream_trufflehog(
+    cmd,
+    on_record=None,
+    out_file_path=None,
+    cancel_event=None,
+    on_tick=None,
+    tick_interval=0.5,
+    stdin_data=None,
+):
+    proc = subprocess.Popen(
+        cmd,
+        stdin=subprocess.PIPE if stdin_data is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        errors="replace",
+        start_new_session=True,
+    )
+    RUNNING_SCANS.add(proc)
+    if SCANS_STOPPED.is_set():
+        kill_process_group(proc)
+    lines, stderr_tail = Queue(), deque(maxlen=200)
+
+    def feed_stdin():
+        # Written from its own thread so a large body cannot deadlock the pipes
+        try:
+            proc.stdin.write(stdin_data)
+            proc.stdin.close()
+        except OSError:  # trufflehog exited early; its status reports why
+            pass
+
+    def drain_stdout():
+        for line in proc.stdout:
+            lines.put(line)
+        lines.put(None)
+
+    def drain_stderr():
+        for line in proc.stderr:
+            stderr_tail.append(line)
+
+    readers = [
+        threading.Thread(target=drain_stdout, daemon=True),
+        threading.Thread(target=drain_stderr, daemon=True),
+    ]
+    if stdin_data is not None:
+        readers.append(threading.Thread(target=feed_stdin, daemon=True))
+    for reader in readers:
+        reader.start()
+
+    out_f = None
+    if out_file_path:
+        os.makedirs(os.path.dirname(out_file_path), exist_ok=True)
+        out_f = open(out_file_path, "a")
+    last_tick = time.monotonic()
+    try:
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                kill_process_group(proc)
+                break
+            try:
+                line = lines.get(timeout=0.1)
+            except Empty:
+                line = ""
+            if line is None:
+                break
+            if line:
+                if out_f:
+                    out_f.write(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                if record is not None and on_record:
+                    on_record(record)
+            if on_tick and time.monotonic() - last_tick >= tick_interval:
+                last_tick = time.monotonic()
+                if out_f:
+                    out_f.flush()
+                on_tick()
+        proc.wait()
+    finally:
+        # Also reached when Streamlit interrupts the script (e.g. Cancel clicked)
+        kill_process_group(proc)
+        RUNNING_SCANS.discard(proc)
+        if out_f:
+            out_f.close()
+        for reader in readers:
+            reader.join(timeout=1)
+    return proc.returncode, "".join(stderr_tail).strip()[-STDERR_TAIL_CHARS:]
+
+
+# Run trufflehog to completion without touching the UI (safe off the script thread)
+def collect_trufflehog(cmd, out_file_path=None, cancel_event=None):
+    records = []
+    returncode, stderr = stream_trufflehog(
+        cmd, records.append, out_file_path, cancel_event=cancel_event
+    )
+    return records, returncode, stderr
+
+
+# Seconds a partially filled web batch may wait before it is scanned anyway
+BATCH_WINDOW_SECONDS = 15
+
+
+# Identity of the detector configuration a page body was scanned with
+def scan_detector_key(settings):
+    config = [settings["verify"] is not None, detector_flags(settings["detectors"])]
+    return hashlib.sha256(json.dumps(config).encode()).hexdigest()
+
+
+# File a filesystem finding was reported in ("" for other sources)
+def finding_file(record):
+    fs_meta = record.get("SourceMetadata", {}).get("Data", {}).get("Filesystem", {})
+    return fs_meta.get("file", "")
+
+
+# Point a finding at the page URL it came from. Findings read from stdin take
+# the same shape as those from scratch files, so cached findings are shared.
+def rebase_finding(record, url):
+    data = record.get("SourceMetadata", {}).get("Data", {})
+    if isinstance(data.get("Stdin"), dict):
+        data["Filesystem"] = data.pop("Stdin")
+    fs_meta = data.get("Filesystem")
+    if isinstance(fs_meta, dict):
+        fs_meta["file"] = url
+    record["SourceName"] = url
+    return record
+
+
+# HTTP cache for the website scanners, kept in the history database. Each URL
+# keeps its validators (ETag / Last-Modified), body hash and links; each body
+# hash keeps its findings per detector configuration. Pages whose body was
+# already scanned are requested conditionally and never rescanned. Safe to use
+# from worker threads (one connection per call).
+class PageCache:
+    def __init__(self, detector_key):
+        self.detector_key = detector_key
+
+    def lookup(self, url):
+        """Cached entry for a URL, only if its body was scanned with these detectors."""
+        with history_db() as conn:
+            return conn.execute(
+                "SELECT h.etag, h.last_modified, h.content_hash, h.links "
+                "FROM http_cache h JOIN content_scans c ON c.content_hash = "
+                "h.content_hash AND c.detector_key = ? WHERE h.url = ?",
+                (self.detector_key, url),
+            ).fetchone()
+
+    def remember(self, url, etag, last_modified, content_hash):
+        with history_db() as conn:
+            conn.execute(
+                "INSERT INTO http_cache "
+                "(url, etag, last_modified, content_hash, links, fetched_at) "
+                "VALUES (?, ?, ?, ?, NULL, ?) ON CONFLICT (url) DO UPDATE SET "
+                "etag = excluded.etag, last_modified = excluded.last_modified, "
+                "content_hash = excluded.content_hash, links = NULL, "
+                "fetched_at = excluded.fetched_at",
+                (url, etag, last_modified, content_hash, time.time()),
+            )
+
+    def store_links(self, url, links):
+        with history_db() as conn:
+            conn.execute(
+                "UPDATE http_cache SET links = ? WHERE url = ?",
+                (json.dumps(links), url),
+            )
+
+    def links(self, url):
+        row = self.lookup(url)
+        return json.loads(row["links"]) if row is not None and row["links"] else None
+
+    def findings(self, content_hash):
+        """Findings of a body already scanned with these detectors, else None."""
+        with history_db() as conn:
+            row = conn.execute(
+                "SELECT findings FROM content_scans "
+                "WHERE content_hash = ? AND detector_key = ?",
+                (content_hash, self.detector_key),
+            ).fetchone()
+        return json.loads(row["findings"]) if row is not None else None
+
+    def store_findings(self, findings_by_hash):
+        with history_db() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO content_scans "
+                "(content_hash, detector_key, findings, scanned_at) "
+                "VALUES (?, ?, ?, ?)",
+                (
+                    (content_hash, self.detector_key, json.dumps(found), time.time())
+                    for content_hash, found in findings_by_hash.items()
+                ),
+            )
+
+
+# GET a page, conditionally when its last version was already scanned with the
+# current detectors. Returns (body, content hash); the body is None when the
+# server answered 304 Not Modified. Runs in worker threads: no Streamlit calls.
+def fetch_page(fetcher, url, cache=None, timeout=10):
+    cached = cache.lookup(url) if cache is not None else None
+    headers = {}
+    if cached is not None and cached["etag"]:
+        headers["If-None-Match"] = cached["etag"]
+    if cached is not None and cached["last_modified"]:
+        headers["If-Modified-Since"] = cached["last_modified"]
+    resp = fetcher.get(url, headers=headers, timeout=timeout)
+    if resp.status_code == 304 and cached is not None:
+        return None, cached["content_hash"]
+    resp.raise_for_status()
+    content_hash = hashlib.sha256(resp.content).hexdigest()
+    if cache is not None:
+        cache.remember(
+            url,
+            resp.headers.get("ETag"),
+            resp.headers.get("Last-Modified"),
+            content_hash,
+        )
+    return resp.text, content_hash
+
+
+# Scratch space for page batches and verification shards. tmpfs is used when
+# it has room, so fetched bodies and secrets never reach the container disk.
+SCRATCH_TMPFS = "/dev/shm"
+SCRATCH_MIN_FREE_BYTES = 256 * 1024 * 1024
+
+
+def scratch_root():
+    try:
+        if (
+            os.access(SCRATCH_TMPFS, os.W_OK)
+            and shutil.disk_usage(SCRATCH_TMPFS).free >= SCRATCH_MIN_FREE_BYTES
+        ):
+            return SCRATCH_TMPFS
+    except OSError:
+        pass
+    return None  # The system temp directory
+
+
+# Collects fetched page bodies and scans them with one trufflehog run per batch.
+# Batches are scanned on a background thread so fetching keeps going meanwhile.
+# The scratch directory is removed on close, or when the scanner is collected
+# after an interrupted scan.
+class PageBatchScanner:
+    def __init__(
+        self,
+        out_file_path,
+        settings,
+        batch_size=50,
+        window_seconds=BATCH_WINDOW_SECONDS,
+        resume=False,
+        cache=None,
+    ):
+        self.settings = settings
+        self.batch_size = batch_size
+        self.window_seconds = window_seconds
+        self.scratch_dir = tempfile.mkdtemp(
+            prefix="trufflehog_pages_", dir=scratch_root()
+        )
+        self._remove_scratch = weakref.finalize(
+            self, shutil.rmtree, self.scratch_dir, True
+        )
+        self.pending = {}  # scratch file path -> original URL
+        self.pending_hashes = {}  # scratch file path -> body hash, for the cache
+        self.cache = cache
+        self.pages_cached = 0
+        self.batch_started = None
+        self.batch_count = 0
+        self.page_count = 0
+        self.pages_scanned = 0
+        self.records = ResultSpool(out_file_path, existing=resume)
+        self.completed_urls = []  # pages whose scan has finished, for checkpoints
+        self.errors = []
+        self._scans = []
+        self._pool = ThreadPoolExecutor(max_workers=1)
+        self._cancel = threading.Event()
+
+    def add(self, url, body, content_hash=None):
+        """Queue one page body; submits the batch once it is full or old enough.
+
+        A body whose hash the cache has already scanned is not queued; its
+        cached findings are reused instead.
+        """
+        if self.cache is not None and content_hash is not None:
+            cached = self.cache.findings(content_hash)
+            if cached is not None:
+                self.records.extend(rebase_finding(r, url) for r in cached)
+                self.pages_cached += 1
+                self.pages_scanned += 1
+                self.completed_urls.append(url)
+                return
+        if not self.pending:
+            self.batch_count += 1
+            self.batch_started = time.monotonic()
+            os.makedirs(self._batch_dir(), exist_ok=True)
+        self.page_count += 1
+        page_path = os.path.join(self._batch_dir(), f"page_{self.page_count:06d}.html")
+        with open(page_path, "w", encoding="utf-8", errors="replace") as f:
+            f.write(body)
+        self.pending[page_path] = url
+        self.pending_hashes[page_path] = content_hash
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Submit every pending page for scanning as one batch."""
+        if not self.pending:
+            return
+        cmd = common_flags(
+            ["trufflehog", "filesystem", self._batch_dir()], self.settings
+        )
+        self._scans.append(
+            self._pool.submit(
+                self._scan_batch,
+                cmd,
+                self._batch_dir(),
+                self.pending,
+                self.pending_hashes,
+            )
+        )
+        self.pending, self.pending_hashes = {}, {}
+
+    def poll(self):
+        """Submit a stale batch and collect finished scans; returns new findings."""
+        if (
+            self.pending
+            and time.monotonic() - self.batch_started >= self.window_seconds
+        ):
+            self.flush()
+        new_records = []
+        for future in [f for f in self._scans if f.done()]:
+            self._scans.remove(future)
+            batch_records, urls, error = future.result()
+            self.pages_scanned += len(urls)
+            self.completed_urls.extend(urls)
+            if error:
+                self.errors.append(error)
+            new_records.extend(batch_records)
+        self.records.extend(new_records)
+        return new_records
+
+    def close(self):
+        """Scan anything still pending, wait for it and remove the scratch directory."""
+        try:
+            self.flush()
+            self._pool.shutdown(wait=True)
+            self.poll()
+        finally:
+            self._remove_scratch()
+        return self.records
+
+    def cancel(self):
+        """Stop the running batch, drop the rest and remove the scratch directory."""
+        self.pending, self.pending_hashes = {}, {}
+        self._cancel.set()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._remove_scratch()
+
+    def _batch_dir(self):
+        return os.path.join(self.scratch_dir, f"batch_{self.batch_count:05d}")
+
+    def _scan_batch(self, cmd, batch_dir, url_by_path, hash_by_path):
+        # Runs on the scan thread, so report errors back instead of raising
+        batch_records, returncode, stderr = collect_trufflehog(
+            cmd, cancel_event=self._cancel
+        )
+        error = f"TruffleHog error: {stderr}" if returncode != 0 else None
+        found_by_path = {path: [] for path in url_by_path}
+        for record in batch_records:
+            path = finding_file(record)
+            self._attribute(record, url_by_path)
+            if path in found_by_path:
+                found_by_path[path].append(record)
+        if self.cache is not None and returncode == 0:
+            # Every scanned body is cached, including those without findings
+            self.cache.store_findings(
+                {
+                    hash_by_path[path]: found
+                    for path, found in found_by_path.items()
+                    if hash_by_path.get(path)
+                }
+            )
+        shutil.rmtree(batch_dir, ignore_errors=True)
+        return batch_records, list(url_by_path.values()), error
+
+    @staticmethod
+    def _attribute(record, url_by_path):
+        # Swap the scratch file name for the page URL it was fetched from
+        url = url_by_path.get(finding_file(record))
+        if url:
+            rebase_finding(record, url)
+
+
+# Responses worth retrying: rate limiting and transient upstream failures
+RETRY_STATUSES = {429, 502, 503, 504}
+MAX_RETRY_DELAY = 120
+
+
+# Seconds to wait according to a Retry-After header (delta-seconds or an
+# HTTP date), or None when the header is missing or unparseable
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+# Token bucket shared by every worker talking to one host. A rate of 0 means
+# unlimited; pause() holds the whole host back after a Retry-After.
+class TokenBucket:
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = max(1.0, burst if burst is not None else rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now >= self.paused_until:
+                    if self.rate <= 0:
+                        return
+                    elapsed = now - self.updated
+                    self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait_for = (1 - self.tokens) / self.rate
+                else:
+                    wait_for = self.paused_until - now
+            time.sleep(wait_for)
+
+    def pause(self, seconds):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+            self.updated = self.paused_until
+
+
+# Shared fetch layer for website scans: one pooled session per host, a token
+# bucket and a concurrency cap per host, and retries with exponential backoff
+# that honour Retry-After. Safe to call from worker threads.
+class HttpFetcher:
+    def __init__(self, per_host=4, rate=10.0, burst=None, max_retries=4, backoff=0.5):
+        self.per_host = per_host
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.hosts = {}
+        self.lock = threading.Lock()
+        self.retries = 0
+
+    def _host(self, url):
+        key = urlsplit(url).netloc.lower()
+        with self.lock:
+            host = self.hosts.get(key)
+            if host is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=1, pool_maxsize=self.per_host
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                host = self.hosts[key] = (
+                    session,
+                    TokenBucket(self.rate, self.burst),
+                    threading.BoundedSemaphore(self.per_host),
+                )
+            return host
+
+    def get(self, url, **kwargs):
+        session, bucket, slot = self._host(url)
+        attempt = 0
+        while True:
+            bucket.acquire()
+            try:
+                with slot:
+                    resp = session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                delay = None
+            else:
+                if (
+                    resp.status_code not in RETRY_STATUSES
+                    or attempt >= self.max_retries
+                ):
+                    return resp
+                delay = parse_retry_after(resp.headers.get("Retry-After"))
+                resp.close()
+                if delay is not None:
+                    bucket.pause(min(delay, MAX_RETRY_DELAY))
+            if delay is None:
+                delay = self.backoff * 2**attempt * (0.5 + random.random())
+            attempt += 1
+            with self.lock:
+                self.retries += 1
+            time.sleep(min(delay, MAX_RETRY_DELAY))
+
+    def close(self):
+        with self.lock:
+            for session, _, _ in self.hosts.values():
+                session.close()
+            self.hosts.clear()
+
+
+# Query parameters that only track clicks or campaigns; dropped before dedupe
+TRACKING_PARAMS = {"fbclid", "gclid", "msclkid", "yclid", "mc_cid", "mc_eid", "_ga"}
+
+
+# Canonical form of a URL for crawl dedupe: lower-cased scheme and host, default
+# port and fragment dropped, tracking parameters removed, query sorted
+def normalize_url(url):
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme not in ("http", "https") or not parts.hostname:
+        return None
+    host = parts.hostname.lower()
+    if ":" in host:
+        host = f"[{host}]"
+    try:
+        port = parts.port
+    except ValueError:
+        return None
+    if port is not None and (scheme, port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{port}"
+    query = urlencode(
+        sorted(
+            (k, v)
+            for k, v in parse_qsl(parts.query, keep_blank_values=True)
+            if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+        )
+    )
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+# Every link on a page, normalised and deduplicated
+def extract_links(page_url, html):
+    links = {}
+    soup = BeautifulSoup(html, "html.parser")
+    for a in soup.find_all("a", href=True):
+        link = normalize_url(urljoin(page_url, a["href"]))
+        if link is not None:
+            links[link] = None
+    return list(links)
+
+
+# Resolve registered domains against the suffix snapshot bundled with
+# tldextract so scoping never tries to download the public suffix list.
+TLD_EXTRACTOR = tldextract.TLDExtract(suffix_list_urls=(), cache_dir=None)
+
+
+@functools.lru_cache(maxsize=65536)
+def registered_domain(host):
+    """Return the registrable domain for a hostname (example.co.uk for
+    a.b.example.co.uk), or the host itself for IPs and bare names."""
+    host = (host or "").lower().rstrip(".")
+    return TLD_EXTRACTOR.extract_str(host).top_domain_under_public_suffix or host
+
+
+def link_in_scope(link, scope, host, root_domain):
+    link_host = urlparse(link).hostname or ""
+    if scope == "Root Domain":
+        return registered_domain(link_host) == root_domain
+    return link_host == host
+
+
+# Fetch one crawl page (runs in a worker thread, so no Streamlit calls here).
+# Returns (body, content hash, in-scope links); on 304 Not Modified the body is
+# None and the links come from the cache.
+def fetch_crawl_page(fetcher, url, scope, host, root_domain, cache=None):
+    body, content_hash = fetch_page(fetcher, url, cache, timeout=5)
+    links = cache.links(url) if body is None else None
+    if links is None:
+        if body is None:  # Links were never stored; fetch the page in full
+            body, content_hash = fetch_page(fetcher, url, timeout=5)
+        links = extract_links(url, body)
+        if cache is not None:
+            cache.store_links(url, links)
+    in_scope = [link for link in links if link_in_scope(link, scope, host, root_domain)]
+    return body, content_hash, in_scope
+
+
+# Crawl frontier kept in the history database. Normalised URLs are the primary
+# key, so duplicates are dropped on insert; shallow pages are fetched first.
+# Pages stay "fetching" until their scan has finished, so after an interruption
+# only pages without saved findings are fetched again.
+# Each write is its own short transaction: one commit per batch of links
+# rather than per row, and no lock held that the fetch workers' cache needs.
+class CrawlFrontier:
+    def __init__(self, conn, crawl_id):
+        self.conn = conn
+        self.crawl_id = crawl_id
+
+    @classmethod
+    def start(cls, conn, start_url, scope, output_path):
+        with conn:
+            cur = conn.execute(
+                "INSERT INTO crawls (start_url, scope, output_path, state, updated) "
+                "VALUES (?, ?, ?, 'running', ?)",
+                (
+                    start_url,
+                    scope,
+                    output_path,
+                    datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                ),
+            )
+        frontier = cls(conn, cur.lastrowid)
+        frontier.add([normalize_url(start_url) or start_url], 0)
+        frontier.checkpoint()
+        return frontier
+
+    @classmethod
+    def resume(cls, conn, crawl_id):
+        with conn:
+            conn.execute(
+                "UPDATE crawl_frontier SET state = 'queued' "
+                "WHERE crawl_id = ? AND state = 'fetching'",
+                (crawl_id,),
+            )
+            conn.execute(
+                "UPDATE crawls SET state = 'running' WHERE id = ?", (crawl_id,)
+            )
+        return cls(conn, crawl_id)
+
+    def add(self, urls, depth):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO crawl_frontier (crawl_id, url, depth) "
+                "VALUES (?, ?, ?)",
+                ((self.crawl_id, url, depth) for url in urls),
+            )
+
+    def claim(self, limit):
+        """Take up to limit queued URLs, shallowest first, as (url, depth) pairs."""
+        rows = self.conn.execute(
+            "SELECT url, depth FROM crawl_frontier WHERE crawl_id = ? "
+            "AND state = 'queued' ORDER BY depth, rowid LIMIT ?",
+            (self.crawl_id, limit),
+        ).fetchall()
+        self.mark([row["url"] for row in rows], "fetching")
+        return [(row["url"], row["depth"]) for row in rows]
+
+    def mark(self, urls, state):
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE crawl_frontier SET state = ? WHERE crawl_id = ? AND url = ?",
+                ((state, self.crawl_id, url) for url in urls),
+            )
+
+    def counts(self):
+        return {
+            row["state"]: row["n"]
+            for row in self.conn.execute(
+                "SELECT state, COUNT(*) AS n FROM crawl_frontier "
+                "WHERE crawl_id = ? GROUP BY state",
+                (self.crawl_id,),
+            )
+        }
+
+    def checkpoint(self, state="running"):
+        self.conn.execute(
+            "UPDATE crawls SET state = ?, updated = ? WHERE id = ?",
+            (state, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), self.crawl_id),
+        )
+        self.conn.commit()
+
+
+# Most recent interrupted crawl of a site, with its page counts
+def unfinished_crawl(start_url, scope):
+    with history_db() as conn:
+        crawl = conn.execute(
+            "SELECT id, output_path, updated FROM crawls WHERE start_url = ? "
+            "AND scope = ? AND state = 'running' ORDER BY id DESC LIMIT 1",
+            (start_url, scope),
+        ).fetchone()
+        if crawl is None:
+            return None
+        counts = CrawlFrontier(conn, crawl["id"]).counts()
+    return dict(crawl, counts=counts)
+
+
+# Crawl-and-scan helper with progress tracking. The frontier is checkpointed to
+# the history database, so passing resume_id continues an interrupted crawl.
+def crawl_and_scan(
+    start_url,
+    max_pages,
+    scope,
+    out_file_path,
+    workers=8,
+    per_host=4,
+    batch_size=50,
+    resume_id=None,
+    cache=None,
+    rate=10.0,
+    settings=None,
+    progress=None,
+):
+    settings = settings or default_settings()
+    progress = progress or ScanProgress()
+    parsed = urlparse(start_url)
+    host = parsed.hostname or ""
+    root_domain = registered_domain(host)
+
+    conn = history_db()
+    if resume_id is not None:
+        frontier = CrawlFrontier.resume(conn, resume_id)
+    else:
+        frontier = CrawlFrontier.start(conn, start_url, scope, out_file_path)
+    counts = frontier.counts()
+    pages_started = counts.get("done", 0) + counts.get("failed", 0)
+    pages_done = pages_started
+
+    fetcher = HttpFetcher(per_host=per_host, rate=rate)
+    scanner = PageBatchScanner(
+        out_file_path,
+        settings,
+        batch_size,
+        resume=resume_id is not None,
+        cache=cache,
+    )
+    in_flight = {}
+    last_checkpoint = time.monotonic()
+
+    def checkpoint(state="running"):
+        # Findings are flushed before their pages are marked done
+        scanner.records.flush()
+        urls, scanner.completed_urls = scanner.completed_urls, []
+        frontier.mark(urls, "done")
+        frontier.checkpoint(state)
+
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        while True:
+            # Keep every worker busy without over-committing past max_pages
+            room = min(workers - len(in_flight), max_pages - pages_started)
+            for url, depth in frontier.claim(room) if room > 0 else []:
+                pages_started += 1
+                future = pool.submit(
+                    fetch_crawl_page,
+                    fetcher,
+                    url,
+                    scope,
+                    host,
+                    root_domain,
+                    cache,
+                )
+                in_flight[future] = (url, depth)
+
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                url, depth = in_flight.pop(future)
+                pages_done += 1
+
+                # Update progress
+                progress.fraction(min(pages_done / max_pages, 1.0))
+                progress.status(
+                    f"Crawling: {pages_done}/{max_pages} pages "
+                    f"({len(in_flight)} in flight) | Current: {url[:50]}..."
+                )
+
+                try:
+                    html, content_hash, links = future.result()
+                except Exception as e:
+                    frontier.mark([url], "failed")
+                    progress.notice("warning", f"Failed to fetch {url}: {e}")
+                    continue
+                frontier.add(links, depth + 1)
+                scanner.add(url, html, content_hash)
+            scanner.poll()
+            if time.monotonic() - last_checkpoint >= 2:
+                checkpoint()
+                last_checkpoint = time.monotonic()
+
+        fetcher.close()
+        progress.status("Scanning remaining pages...")
+        all_results = scanner.close()
+        checkpoint("done")
+    finally:
+        # Reached on interruption too: keep what finished for a later resume,
+        # then don't wait on fetches nobody will collect and drop whatever the
+        # scanner has not started on
+        scanner.records.flush()
+        frontier.mark(scanner.completed_urls, "done")
+        conn.commit()
+        conn.close()
+        pool.shutdown(wait=False, cancel_futures=True)
+        fetcher.close()
+        scanner.cancel()
+    for error in scanner.errors:
+        progress.notice("error", error)
+    progress.fraction(1.0)
+    progress.status(
+        f"Crawl complete! Scanned {pages_done} pages"
+        + (f" ({scanner.pages_cached} unchanged)." if scanner.pages_cached else ".")
+    )
+    if fetcher.retries:
+        progress.notice(
+            "info",
+            f"{fetcher.retries} request(s) were retried after rate limiting "
+            "or transient errors.",
+        )
+    return all_results
+
+
+# Downloaded copy of the Gobuster wordlist when the bundled one is missing
+WORDLIST_CACHE_DIR = os.path.expanduser("~/.cache/trufflehog_wordlists")
+
+
+# Gobuster's wordlist: the bundled copy, else one downloaded into the cache
+# directory, so it is fetched once rather than per scan
+BUNDLED_WORDLIST = "/usr/share/wordlists/raft-small-directories.txt"
+WORDLIST_URL = (
+    "https://raw.githubusercontent.com/danielmiessler/"
+    "SecLists/master/Discovery/Web-Content/raft-small-directories.txt"
+)
+
+
+def gobuster_wordlist():
+    if os.path.exists(BUNDLED_WORDLIST):
+        return BUNDLED_WORDLIST
+    wl_path = os.path.join(WORDLIST_CACHE_DIR, os.path.basename(BUNDLED_WORDLIST))
+    if not os.path.exists(wl_path):
+        fetcher = HttpFetcher(per_host=1, rate=0)
+        try:
+            wl_resp = fetcher.get(WORDLIST_URL, timeout=60)
+        finally:
+            fetcher.close()
+        wl_resp.raise_for_status()
+        os.makedirs(WORDLIST_CACHE_DIR, exist_ok=True)
+        with open(wl_path + ".part", "wb") as f:
+            f.write(wl_resp.content)
+        os.replace(wl_path + ".part", wl_path)
+    return wl_path
+
+
+# Gobuster run whose hits stream straight into the fetch and scan stages
+def gobuster_dir_cmd(base_url, wordlist, threads, log_path):
+    return [
+        "gobuster",
+        "dir",
+        "-u",
+        base_url,
+        "-w",
+        wordlist,
+        "-t",
+        str(threads),
+        "-e",
+        "-s",
+        "200,204,301,302,307,401,403",
+        "-b",
+        "",
+        "-q",
+        "-o",
+        log_path,
+    ]
+
+
+# Matches terminal escape sequences gobuster may emit around its results
+ANSI_ESCAPE = re.compile(r"\x1b\[[0-9;]*[A-Za-z]")
+
+
+# Read gobuster's stdout and queue each discovered URL (runs in a reader thread)
+def read_gobuster_paths(stream, discovered, tail):
+    seen = set()
+    for line in stream:
+        line = ANSI_ESCAPE.sub("", line).strip()
+        if not line or line.startswith("===="):
+            continue
+        url_candidate = line.split()[0]
+        if not url_candidate.startswith(("http://", "https://")):
+            tail.append(line)
+            continue
+        if url_candidate not in seen:
+            seen.add(url_candidate)
+            discovered.put(url_candidate)
+    discovered.put(None)
+
+
+# Gobuster discovery -> concurrent fetch -> batched scan, all running at once
+def bruteforce_and_scan(
+    gobuster_cmd,
+    out_file_path,
+    workers=16,
+    batch_size=50,
+    cache=None,
+    rate=10.0,
+    settings=None,
+    progress=None,
+):
+    settings = settings or default_settings()
+    progress = progress or ScanProgress()
+    gobuster = subprocess.Popen(
+        gobuster_cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        start_new_session=True,
+    )
+    RUNNING_SCANS.add(gobuster)
+    if SCANS_STOPPED.is_set():
+        kill_process_group(gobuster)
+    discovered, gobuster_tail = Queue(), deque(maxlen=20)
+    reader = threading.Thread(
+        target=read_gobuster_paths,
+        args=(gobuster.stdout, discovered, gobuster_tail),
+        daemon=True,
+    )
+    reader.start()
+
+    fetcher = HttpFetcher(per_host=workers, rate=rate)
+    scanner = PageBatchScanner(out_file_path, settings, batch_size, cache=cache)
+    to_fetch, in_flight = deque(), {}
+    discovered_count = fetched_count = 0
+    enumerating = True
+
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        while enumerating or to_fetch or in_flight:
+            try:
+                while True:
+                    found = discovered.get_nowait()
+                    if found is None:
+                        enumerating = False
+                        break
+                    discovered_count += 1
+                    to_fetch.append(found)
+            except Empty:
+                pass
+
+            while to_fetch and len(in_flight) < workers:
+                url = to_fetch.popleft()
+                in_flight[pool.submit(fetch_page, fetcher, url, cache)] = url
+
+            if in_flight:
+                done, _ = wait(in_flight, timeout=0.2, return_when=FIRST_COMPLETED)
+            else:
+                done = set()
+                time.sleep(0.2)
+            for future in done:
+                url = in_flight.pop(future)
+                try:
+                    body, content_hash = future.result()
+                except Exception as e:
+                    progress.notice("warning", f"Failed to fetch {url}: {e}")
+                    continue
+                fetched_count += 1
+                scanner.add(url, body, content_hash)
+            scanner.poll()
+
+            progress.metrics(
+                {
+                    "Discovered": discovered_count,
+                    "Fetched": fetched_count,
+                    "Scanned": scanner.pages_scanned,
+                    "Findings": len(scanner.records),
+                }
+            )
+            progress.status(
+                "Gobuster enumerating..."
+                if enumerating
+                else "Fetching remaining paths..."
+            )
+
+        gobuster.wait()
+        if gobuster.returncode != 0 and not discovered_count:
+            progress.notice("error", f"Gobuster error: {' '.join(gobuster_tail)}")
+
+        progress.status("Scanning remaining pages...")
+        records = scanner.close()
+    finally:
+        # Also reached when the scan is interrupted: stop gobuster's process
+        # group, don't wait on fetches nobody will collect and drop whatever
+        # the scanner has not started on
+        kill_process_group(gobuster)
+        RUNNING_SCANS.discard(gobuster)
+        pool.shutdown(wait=False, cancel_futures=True)
+        fetcher.close()
+        scanner.cancel()
+    for error in scanner.errors:
+        progress.notice("error", error)
+    progress.metrics(
+        {
+            "Discovered": discovered_count,
+            "Fetched": fetched_count,
+            "Scanned": scanner.pages_scanned,
+            "Findings": len(records),
+        }
+    )
+    progress.status(
+        f"Directory scan complete! Found {discovered_count} paths"
+        + (f" ({scanner.pages_cached} unchanged)." if scanner.pages_cached else ".")
+    )
+    if fetcher.retries:
+        progress.notice(
+            "info",
+            f"{fetcher.retries} request(s) were retried after rate limiting "
+            "or transient errors.",
+        )
+    return records
+
+
+# Identity of a secret for verification: the same key found in many places is
+# verified once
+def verification_key(record):
+    return f"{record.get('DetectorName', 'Unknown')}:{secret_hash(record)}"
+
+
+# Re-detection input for one candidate: the detector name as a keyword, then
+# Raw and RawV2 on lines of their own. A RawV2 that extends Raw (e.g. an AWS key
+# id followed by its secret) is split, so each part sits on a word boundary.
+def verification_input(record):
+    raw, raw_v2 = record.get("Raw", ""), record.get("RawV2", "")
+    if raw and raw_v2.startswith(raw):
+        raw_v2 = raw_v2[len(raw) :]
+    return f"{record.get('DetectorName', '').lower()} {raw}\n{raw_v2}\n"
+
+
+# Phase two of a two-phase scan. Distinct candidates are re-checked by
+# trufflehog with verification enabled, split over a few bounded workers, and
+# outcomes are cached by secret key for ttl_seconds. Only candidates trufflehog
+# re-detected get (and cache) an outcome; the rest stay unverified with a
+# VerificationError and are retried next time. Findings of secrets re-checked
+# as invalid are dropped, as a single-phase scan (--results=verified,unknown)
+# never reports them. Updates records in place.
+def verify_findings(records, workers=4, ttl_seconds=86400):
+    candidates = {}
+    for record in records:
+        candidates.setdefault(verification_key(record), record)
+    outcomes = {}
+    with history_db() as conn:
+        keys = list(candidates)
+        for start in range(0, len(keys), 500):
+            chunk = keys[start : start + 500]
+            rows = conn.execute(
+                "SELECT secret_key, verified, verification_error FROM "
+                f"verification_cache WHERE checked_at >= ? AND secret_key IN "
+                f"({','.join('?' * len(chunk))})",
+                [time.time() - ttl_seconds] + chunk,
+            ).fetchall()
+            for row in rows:
+                outcomes[row["secret_key"]] = (
+                    bool(row["verified"]),
+                    row["verification_error"],
+                )
+    cached = len(outcomes)
+    pending = [key for key in candidates if key not in outcomes]
+
+    def check_shard(shard):
+        # One file per candidate so results map straight back to their key
+        with tempfile.TemporaryDirectory(
+            prefix="trufflehog_verify_", dir=scratch_root()
+        ) as shard_dir:
+            key_by_file = {}
+            for n, key in enumerate(shard):
+                record = candidates[key]
+                path = os.path.join(shard_dir, f"candidate_{n:06d}.txt")
+                with open(path, "w", encoding="utf-8", errors="replace") as f:
+                    f.write(verification_input(record))
+                key_by_file[path] = key
+            detectors = sorted({candidates[k].get("DetectorName", "") for k in shard})
+            cmd = [
+                "trufflehog",
+                "filesystem",
+                shard_dir,
+                "--json",
+                "--no-update",
+                "--results=verified,unknown,unverified",
+                f"--include-detectors={','.join(d for d in detectors if d)}",
+            ]
+            results, returncode, stderr = collect_trufflehog(cmd)
+        if returncode != 0:
+            return {}, f"verification run failed: {stderr[-300:]}"
+        shard_outcomes = {}
+        for result in results:
+            path = (
+                result.get("SourceMetadata", {})
+                .get("Data", {})
+                .get("Filesystem", {})
+                .get("file", "")
+            )
+            key = key_by_file.get(path)
+            if key is None or verification_key(result) != key:
+                continue
+            verified, error = shard_outcomes.get(key, (False, None))
+            shard_outcomes[key] = (
+                verified or bool(result.get("Verified")),
+                error or result.get("VerificationError"),
+            )
+        return shard_outcomes, "not re-detected by the verification pass"
+
+    unresolved = {}
+    if pending:
+        shards = [pending[i :: max(1, workers)] for i in range(max(1, workers))]
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for shard, (shard_outcomes, reason) in zip(
+                [s for s in shards if s],
+                pool.map(check_shard, [s for s in shards if s]),
+            ):
+                outcomes.update(shard_outcomes)
+                unresolved.update(
+                    (key, reason) for key in shard if key not in shard_outcomes
+                )
+        with history_db() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO verification_cache "
+                "(secret_key, detector, verified, verification_error, checked_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    (
+                        key,
+                        candidates[key].get("DetectorName", "Unknown"),
+                        int(outcomes[key][0]),
+                        outcomes[key][1],
+                        time.time(),
+                    )
+                    for key in pending
+                    if key in outcomes
+                ),
+            )
+
+    def apply_outcome(record):
+        key = verification_key(record)
+        verified, error = outcomes.get(key, (False, unresolved.get(key)))
+        record["Verified"] = verified
+        if error:
+            record["VerificationError"] = error
+
+    # Unverified without an error: checked and found invalid
+    def keep(record):
+        return record["Verified"] or bool(record.get("VerificationError"))
+
+    findings = len(records)
+    if isinstance(records, ResultSpool):
+        records.rewrite(apply_outcome, keep)
+    else:
+        for record in records:
+            apply_outcome(record)
+        records[:] = [record for record in records if keep(record)]
+    return {
+        "findings": findings,
+        "dropped": findings - len(records),
+        "candidates": len(candidates),
+        "cached": cached,
+        "checked": len(pending) - len(unresolved),
+        "unresolved": len(unresolved),
+        "verified": sum(1 for verified, _ in outcomes.values() if verified),
+    }
+
+
+# Occurrences kept per aggregated secret; the count stays exact beyond this
+MAX_OCCURRENCES = 1000
+
+
+# Collapse findings of the same secret into one record listing where it was
+# found. Already aggregated records (e.g. from an earlier scan) merge in too.
+# Grouping runs in a private on-disk SQLite database, so memory stays flat
+# however many findings there are; returns a ResultSpool in first-seen order.
+def aggregate_findings(records):
+    conn = sqlite3.connect("")
+    conn.executescript("""
+        CREATE TABLE secrets (
+            seq INTEGER PRIMARY KEY,
+            key TEXT NOT NULL UNIQUE,
+            record TEXT NOT NULL,
+            verified INTEGER NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0,
+            kept INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE occurrences (seq INTEGER NOT NULL, occurrence TEXT NOT NULL);
+        CREATE INDEX idx_occurrences_seq ON occurrences(seq);
+        """)
+    try:
+        for record in records:
+            occurrences = record.get("Occurrences") or [
+                {
+                    "SourceName": record.get("SourceName", ""),
+                    "SourceMetadata": record.get("SourceMetadata", {}),
+                }
+            ]
+            key = verification_key(record)
+            row = conn.execute(
+                "SELECT seq, kept FROM secrets WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                seq, kept = (
+                    conn.execute(
+                        "INSERT INTO secrets (key, record) VALUES (?, ?)",
+                        (key, json.dumps(record)),
+                    ).lastrowid,
+                    0,
+                )
+            else:
+                seq, kept = row
+            keep = occurrences[: max(0, MAX_OCCURRENCES - kept)]
+            conn.executemany(
+                "INSERT INTO occurrences (seq, occurrence) VALUES (?, ?)",
+                ((seq, json.dumps(o)) for o in keep),
+            )
+            conn.execute(
+                "UPDATE secrets SET verified = max(verified, ?), count = count + ?, "
+                "kept = kept + ? WHERE seq = ?",
+                (
+                    int(bool(record.get("Verified"))),
+                    record.get("OccurrenceCount", len(occurrences)),
+                    len(keep),
+                    seq,
+                ),
+            )
+        unique = ResultSpool()
+        for seq, record, verified, count in conn.execute(
+            "SELECT seq, record, verified, count FROM secrets ORDER BY seq"
+        ):
+            entry = json.loads(record)
+            if verified:
+                entry["Verified"] = True
+            entry["Occurrences"] = [
+                json.loads(occurrence)
+                for (occurrence,) in conn.execute(
+                    "SELECT occurrence FROM occurrences WHERE seq = ? ORDER BY rowid",
+                    (seq,),
+                )
+            ]
+            entry["OccurrenceCount"] = count
+            unique.append(entry)
+    finally:
+        conn.close()
+    return unique
+
+
+# Persist a finished scan without touching the UI; returns (records, scan id)
+# with the records as stored
+def record_scan(scan_mode, records, target="", aggregate=False):
+    if aggregate:
+        records = aggregate_findings(records)
+    with history_db() as conn:
+        scan_id = insert_scan(
+            conn,
+            datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            scan_mode,
+            target,
+            records,
+            aggregate,
+        )
+    return records, scan_id
+
+
+# Current commit of a repo's branch (or HEAD) without cloning it
+def remote_head(repo, branch="", timeout=0):
+    ref = f"refs/heads/{branch}" if branch else "HEAD"
+    if repo.startswith("file://"):
+        # git would read file://./repo as host "." and path /repo; trufflehog
+        # resolves the path from the working directory, so do the same
+        repo = "file://" + os.path.abspath(repo[len("file://") :])
+    try:
+        proc = subprocess.run(
+            ["git", "ls-remote", repo, ref],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            timeout=timeout or 120,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if proc.returncode != 0 or not proc.stdout.strip():
+        return None
+    return proc.stdout.split()[0]
+
+
+# Work out what a git scan has to do. In incremental mode only commits after
+# the stored watermark are scanned; cmd is None when nothing new was committed.
+def plan_git_scan(repo, branch, incremental, settings):
+    head = remote_head(repo, branch, settings["git_clone_timeout"])
+    watermark = get_git_watermark(repo, branch) if incremental else None
+    cmd = ["trufflehog", "git", repo]
+    if branch:
+        cmd += ["--branch", branch]
+    if watermark is not None:
+        if head == watermark["head_commit"]:
+            cmd = None
+        else:
+            cmd += ["--since-commit", watermark["head_commit"]]
+    return {
+        "repo": repo,
+        "branch": branch,
+        "target": f"{repo}@{branch}" if branch else repo,
+        "head": head,
+        "watermark": dict(watermark) if watermark is not None else None,
+        "cmd": common_flags(cmd, settings) if cmd else None,
+        "verify": settings["verify"],
+        "aggregate": settings["aggregate"],
+    }
+
+
+# Merge new findings with those of the watermark scan, save the result and move
+# the watermark forward. UI-free so background jobs can call it too.
+def finish_git_scan(scan_mode, plan, new_records, ok):
+    if plan["verify"] and new_records:
+        verify_findings(new_records, **plan["verify"])
+    records = new_records
+    watermark = plan["watermark"]
+    if watermark is not None and watermark["scan_id"] is not None:
+        # Carry forward earlier findings not re-reported, streamed into a spool
+        new_fingerprints = {finding_fingerprint(r) for r in new_records}
+        records = ResultSpool()
+        for chunk in iter_scan_findings(watermark["scan_id"]):
+            records.extend(
+                r for r in chunk if finding_fingerprint(r) not in new_fingerprints
+            )
+        records.extend(new_records)
+    records, scan_id = record_scan(
+        scan_mode, records, plan["target"], plan["aggregate"]
+    )
+    if ok and plan["head"]:
+        set_git_watermark(plan["repo"], plan["branch"], plan["head"], scan_id)
+    return records, scan_id
+
+
+# List an organisation's (or user's) clone URLs from the GitHub REST API.
+# api_url can point at a local stand-in server for testing.
+def list_org_repos(
+    org, api_url="https://api.github.com", token="", include_forks=False
+):
+    headers = {"Accept": "application/vnd.github+json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    api_url = api_url.rstrip("/")
+    repos = []
+    for owner_type in ("orgs", "users"):
+        page = 1
+        while True:
+            resp = requests.get(
+                f"{api_url}/{owner_type}/{org}/repos",
+                params={"per_page": 100, "page": page, "type": "all"},
+                headers=headers,
+                timeout=30,
+            )
+            if resp.status_code == 404 and owner_type == "orgs" and page == 1:
+                break  # Not an org; retry as a user account
+            resp.raise_for_status()
+            batch = resp.json()
+            repos.extend(
+                r["clone_url"] for r in batch if include_forks or not r.get("fork")
+            )
+            if len(batch) < 100:
+                return repos
+            page += 1
+    return repos
+
+
+# Scan a list of repositories with a pool of trufflehog processes, splitting the
+# global concurrency budget between them. Results are shown per repo as each
+# process finishes; returns (records, failed repos).
+def fan_out_org_scan(repos, out_file_path, workers, settings, progress=None):
+    progress = progress or ScanProgress()
+    workers = max(1, min(workers, len(repos)))
+    per_process = max(1, settings["concurrency"] // workers)
+    status = {
+        repo: {"Repository": repo, "Status": "queued", "Findings": 0} for repo in repos
+    }
+    cancel = threading.Event()
+
+    def scan_repo(repo):
+        status[repo]["Status"] = "running"
+        started = time.monotonic()
+        cmd = common_flags(["trufflehog", "git", repo], settings, per_process)
+        repo_records, returncode, stderr = collect_trufflehog(cmd, cancel_event=cancel)
+        status[repo]["Seconds"] = round(time.monotonic() - started, 1)
+        return repo_records, returncode, stderr
+
+    all_records, failed = ResultSpool(out_file_path), []
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        try:
+            pending = {pool.submit(scan_repo, repo): repo for repo in repos}
+            while pending:
+                done, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in done:
+                    repo = pending.pop(future)
+                    try:
+                        repo_records, returncode, stderr = future.result()
+                    except Exception as e:
+                        repo_records, returncode, stderr = [], -1, str(e)
+                    if returncode != 0:
+                        status[repo]["Status"] = "failed"
+                        status[repo]["Error"] = stderr[-300:]
+                        failed.append(repo)
+                    else:
+                        status[repo]["Status"] = "done"
+                    status[repo]["Findings"] = len(repo_records)
+                    # Only this thread writes the spool, so lines never interleave
+                    all_records.extend(repo_records)
+
+                finished = len(repos) - len(pending)
+                progress.fraction(finished / len(repos))
+                progress.status(
+                    f"Repositories: {finished}/{len(repos)} finished, "
+                    f"{len(failed)} failed | {len(all_records)} findings | "
+                    f"{workers} workers x --concurrency {per_process}"
+                )
+                progress.table(list(status.values()))
+        finally:
+            # Also reached when the scan is interrupted: stop the repo
+            # processes before the pool waits for its threads
+            cancel.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    return all_records, failed
+
+
+# Pre-walk defaults for sharded filesystem scans: content trufflehog cannot
+# usefully scan (binaries, archives, media) and dependency or VCS trees
+FS_EXCLUDE_EXTENSIONS = (
+    ".7z .a .bin .bmp .bz2 .class .dll .dylib .exe .gif .gz .ico .iso .jar .jpeg "
+    ".jpg .mkv .mov .mp3 .mp4 .o .otf .png .pyc .rar .so .tar .tgz .ttf .wav "
+    ".webm .webp .woff .woff2 .xz .zip .zst"
+)
+FS_EXCLUDE_GLOBS = "node_modules, .git, __pycache__, .venv, .tox"
+
+# File list bytes per trufflehog invocation, well under the kernel's argv limit
+FS_ARGV_BYTES = 256 * 1024
+
+
+# Walk the given paths and list every regular file that passes the exclusion
+# rules as (path, size, mtime_ns, inode). Excluded directories are pruned
+# rather than walked. Returns (files, excluded file count).
+def build_file_manifest(paths, exclude_exts=(), exclude_globs=(), max_bytes=0):
+    exclude_exts = {e.lower() for e in exclude_exts}
+    files, excluded = {}, 0
+
+    def is_excluded(path):
+        name = os.path.basename(path)
+        return any(
+            fnmatch.fnmatch(name, g) or fnmatch.fnmatch(path, g) for g in exclude_globs
+        )
+
+    def consider(path):
+        nonlocal excluded
+        try:
+            info = os.stat(path, follow_symlinks=False)
+        except OSError:
+            return
+        if not stat.S_ISREG(info.st_mode):
+            return
+        if (
+            os.path.splitext(path)[1].lower() in exclude_exts
+            or is_excluded(path)
+            or (max_bytes and info.st_size > max_bytes)
+        ):
+            excluded += 1
+            return
+        files[path] = (path, info.st_size, info.st_mtime_ns, info.st_ino)
+
+    for root in paths:
+        root = os.path.abspath(os.path.expanduser(root))
+        if not os.path.isdir(root):
+            consider(root)
+            continue
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [
+                d for d in dirnames if not is_excluded(os.path.join(dirpath, d))
+            ]
+            for name in filenames:
+                consider(os.path.join(dirpath, name))
+    return list(files.values()), excluded
+
+
+# Stored findings of files unchanged (same size, mtime and inode) since their
+# last scan with the given detector configuration, keyed by path
+def unchanged_file_findings(files, detector_key):
+    unchanged = {}
+    with history_db() as conn:
+        for i in range(0, len(files), 500):
+            chunk = {f[0]: f for f in files[i : i + 500]}
+            rows = conn.execute(
+                "SELECT path, size, mtime_ns, inode, findings FROM file_scans "
+                f"WHERE detector_key = ? AND path IN ({','.join('?' * len(chunk))})",
+                [detector_key, *chunk],
+            )
+            for row in rows:
+                if chunk[row["path"]][1:] == (
+                    row["size"],
+                    row["mtime_ns"],
+                    row["inode"],
+                ):
+                    unchanged[row["path"]] = json.loads(row["findings"])
+    return unchanged
+
+
+# Remember what each scanned file contained, including files without findings
+def record_file_scans(detector_key, findings_by_file):
+    now = time.time()
+    with history_db() as conn:
+        conn.executemany(
+            "INSERT INTO file_scans "
+            "(path, detector_key, size, mtime_ns, inode, findings, scanned_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (path, detector_key) DO UPDATE "
+            "SET size = excluded.size, mtime_ns = excluded.mtime_ns, "
+            "inode = excluded.inode, findings = excluded.findings, "
+            "scanned_at = excluded.scanned_at",
+            (
+                (path, detector_key, size, mtime_ns, inode, json.dumps(found), now)
+                for (path, size, mtime_ns, inode), found in findings_by_file.items()
+            ),
+        )
+
+
+# Split files into at most `shards` lists of roughly equal total size, largest
+# file first onto the lightest shard
+def shard_by_bytes(files, shards):
+    heap = [(0, n) for n in range(max(1, shards))]
+    buckets = [[] for _ in heap]
+    for f in sorted(files, key=lambda f: f[1], reverse=True):
+        total, n = heapq.heappop(heap)
+        buckets[n].append(f)
+        heapq.heappush(heap, (total + f[1], n))
+    return [b for b in buckets if b]
+
+
+# Consecutive runs of files whose paths fit in one trufflehog command line
+def argv_chunks(files, limit=FS_ARGV_BYTES):
+    chunk, size = [], 0
+    for f in files:
+        length = len(os.fsencode(f[0])) + 1
+        if chunk and size + length > limit:
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(f)
+        size += length
+    if chunk:
+        yield chunk
+
+
+# Sharded filesystem scan: pre-walk, skip unchanged files, then run one
+# trufflehog process per byte-balanced shard and merge their JSONL into one
+# spool. Findings of skipped files are carried forward from their last scan.
+def scan_filesystem_sharded(
+    paths,
+    out_file_path,
+    workers,
+    settings,
+    exclude_exts=(),
+    exclude_globs=(),
+    max_bytes=0,
+    skip_unchanged=True,
+    progress=None,
+):
+    progress = progress or ScanProgress()
+    progress.status("Walking paths...")
+    files, excluded = build_file_manifest(paths, exclude_exts, exclude_globs, max_bytes)
+    detector_key = scan_detector_key(settings)
+    unchanged = unchanged_file_findings(files, detector_key) if skip_unchanged else {}
+    pending = [f for f in files if f[0] not in unchanged]
+
+    all_records = ResultSpool(out_file_path)
+    for found in unchanged.values():
+        all_records.extend(found)
+    progress.notice(
+        "text",
+        f"Manifest: {len(files)} files ({sum(f[1] for f in files) / 1e6:.1f} MB), "
+        f"{excluded} excluded, {len(unchanged)} unchanged since their last scan.",
+    )
+    shards = shard_by_bytes(pending, workers)
+    if not shards:
+        progress.status("Nothing to scan.")
+        return all_records, 0
+
+    per_process = max(1, settings["concurrency"] // len(shards))
+    status = [
+        {
+            "Shard": n + 1,
+            "Status": "queued",
+            "Files": f"0/{len(shard)}",
+            "MB": round(sum(f[1] for f in shard) / 1e6, 1),
+            "Findings": 0,
+        }
+        for n, shard in enumerate(shards)
+    ]
+    total_bytes = sum(f[1] for f in pending) or 1
+    scanned_bytes = 0
+    chunk_results, cancel = Queue(), threading.Event()
+
+    def scan_shard(n, shard):
+        row = status[n]
+        row["Status"] = "running"
+        files_done = 0
+        for chunk in argv_chunks(shard):
+            if cancel.is_set():
+                return False
+            found_by_file = {f: [] for f in chunk}
+            file_by_path = {f[0]: f for f in chunk}
+            cmd = common_flags(
+                ["trufflehog", "filesystem", *file_by_path], settings, per_process
+            )
+            chunk_records, returncode, stderr = collect_trufflehog(
+                cmd, cancel_event=cancel
+            )
+            attributed = True
+            for record in chunk_records:
+                f = file_by_path.get(finding_file(record))
+                if f is None:
+                    attributed = False
+                else:
+                    found_by_file[f].append(record)
+            if returncode == 0 and attributed:
+                record_file_scans(detector_key, found_by_file)
+            files_done += len(chunk)
+            row["Files"] = f"{files_done}/{len(shard)}"
+            row["Findings"] += len(chunk_records)
+            chunk_results.put((chunk_records, sum(f[1] for f in chunk)))
+            if returncode != 0:
+                row["Status"] = "failed"
+                row["Error"] = stderr[-300:]
+                return False
+        row["Status"] = "done"
+        return True
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=len(shards)) as pool:
+        try:
+            running = [pool.submit(scan_shard, n, s) for n, s in enumerate(shards)]
+            while running:
+                done, _ = wait(running, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in done:
+                    running.remove(future)
+                    try:
+                        failed += not future.result()
+                    except Exception:
+                        failed += 1
+                # Only this thread writes the spool, so lines never interleave
+                while not chunk_results.empty():
+                    chunk_records, chunk_bytes = chunk_results.get()
+                    all_records.extend(chunk_records)
+                    scanned_bytes += chunk_bytes
+                progress.fraction(min(1.0, scanned_bytes / total_bytes))
+                progress.status(
+                    f"Shards: {len(shards) - len(running)}/{len(shards)} finished, "
+                    f"{failed} failed | {scanned_bytes / 1e6:.1f}/"
+                    f"{total_bytes / 1e6:.1f} MB | {len(all_records)} findings | "
+                    f"{len(shards)} workers x --concurrency {per_process}"
+                )
+                progress.table(status)
+        finally:
+            # Also reached when the script is interrupted: stop the shard
+            # processes before the pool waits for its threads
+            cancel.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+    return all_records, failed
+
+
+# Google Cloud Storage JSON API used to list bucket prefixes; point it at an
+# emulator (e.g. fake-gcs-server) for local testing
+GCS_API_ENDPOINT = "https://storage.googleapis.com"
+
+
+# Top-level prefixes ("folders") of a GCS bucket, e.g. ["logs/", "backups/"]
+def list_gcs_prefixes(bucket, endpoint=GCS_API_ENDPOINT, token=""):
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    url = f"{endpoint.rstrip('/')}/storage/v1/b/{quote(bucket, safe='')}/o"
+    fetcher = HttpFetcher(per_host=1, rate=0)
+    prefixes, page_token = [], None
+    try:
+        while True:
+            params = {"delimiter": "/", "fields": "prefixes,nextPageToken"}
+            if page_token:
+                params["pageToken"] = page_token
+            resp = fetcher.get(url, params=params, headers=headers, timeout=30)
+            resp.raise_for_status()
+            data = resp.json()
+            prefixes.extend(data.get("prefixes", []))
+            page_token = data.get("nextPageToken")
+            if not page_token:
+                return prefixes
+    finally:
+        fetcher.close()
+
+
+# Shards for a bucket scan. Each shard is a dict: {} scans everything the
+# credentials reach, {"bucket"} one bucket, {"bucket", "prefix"} one GCS
+# prefix and {"bucket", "exclude"} the rest of a GCS bucket outside the listed
+# prefixes. S3 shards are whole buckets: trufflehog s3 cannot filter by prefix.
+def bucket_shards(scan_mode, entries, split_prefixes=False, endpoint="", token=""):
+    shards = []
+    for entry in entries:
+        bucket, _, prefix = entry.partition("/")
+        if scan_mode != "GCS Bucket Scan":
+            shards.append({"bucket": entry})
+        elif prefix:
+            shards.append({"bucket": bucket, "prefix": prefix})
+        elif split_prefixes:
+            prefixes = list_gcs_prefixes(bucket, endpoint, token)
+            shards.extend({"bucket": bucket, "prefix": p} for p in prefixes)
+            shards.append({"bucket": bucket, "exclude": prefixes})
+        else:
+            shards.append({"bucket": bucket})
+    return shards or [{}]
+
+
+def bucket_shard_label(shard):
+    if "prefix" in shard:
+        return f"{shard['bucket']}/{shard['prefix']}"
+    if "exclude" in shard:
+        return f"{shard['bucket']}/ (other objects)"
+    return shard.get("bucket", "(all buckets)")
+
+
+def bucket_shard_cmd(scan_mode, target, shard, settings, worker_concurrency=None):
+    if scan_mode == "GCS Bucket Scan":
+        cmd = ["trufflehog", "gcs", "--project-id", target, "--cloud-environment"]
+        if "bucket" in shard:
+            cmd.append(f"--include-buckets={shard['bucket']}")
+        if "prefix" in shard:
+            cmd.append(f"--include-objects={shard['prefix']}*")
+        if shard.get("exclude"):
+            cmd.append(
+                f"--exclude-objects={','.join(p + '*' for p in shard['exclude'])}"
+            )
+    else:
+        cmd = ["trufflehog", "s3"]
+        if scan_mode == "S3 Bucket with IAM Role":
+            cmd += ["--role-arn", target]
+        if "bucket" in shard:
+            cmd += ["--bucket", shard["bucket"]]
+    return common_flags(cmd, settings, worker_concurrency)
+
+
+# Latest interrupted sharded scan of a target, with its shard counts by state
+def unfinished_bucket_scan(scan_mode, target):
+    with history_db() as conn:
+        run = conn.execute(
+            "SELECT id, output_path, updated FROM bucket_scans WHERE mode = ? "
+            "AND target = ? AND state = 'running' ORDER BY id DESC LIMIT 1",
+            (scan_mode, target),
+        ).fetchone()
+        if run is None:
+            return None
+        counts = dict(
+            conn.execute(
+                "SELECT state, COUNT(*) FROM bucket_shards WHERE run_id = ? "
+                "GROUP BY state",
+                (run["id"],),
+            ).fetchall()
+        )
+    return dict(run, counts=counts)
+
+
+# Sharded bucket scan: one trufflehog process per shard under the concurrency
+# budget. Shards are checkpointed in the history database as they finish, and
+# only the findings of completed shards are written to the output file, so
+# passing resume_id rescans just the shards that had not completed.
+def scan_bucket_shards(
+    scan_mode,
+    target,
+    shards,
+    out_file_path,
+    workers,
+    settings,
+    resume_id=None,
+    progress=None,
+):
+    progress = progress or ScanProgress()
+    conn = history_db()
+    conn.isolation_level = None  # Autocommit: every shard is a checkpoint
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    if resume_id is None:
+        run_id = conn.execute(
+            "INSERT INTO bucket_scans (mode, target, output_path, state, updated) "
+            "VALUES (?, ?, ?, 'running', ?)",
+            (scan_mode, target, out_file_path, now),
+        ).lastrowid
+        conn.executemany(
+            "INSERT OR IGNORE INTO bucket_shards (run_id, shard) VALUES (?, ?)",
+            ((run_id, json.dumps(s, sort_keys=True)) for s in shards),
+        )
+    else:
+        run_id = resume_id
+    rows = conn.execute(
+        "SELECT shard, state, findings FROM bucket_shards WHERE run_id = ?",
+        (run_id,),
+    ).fetchall()
+    status = {
+        row["shard"]: {
+            "Shard": bucket_shard_label(json.loads(row["shard"])),
+            "Status": "done (earlier run)" if row["state"] == "done" else "queued",
+            "Findings": row["findings"],
+        }
+        for row in rows
+    }
+    todo = [row["shard"] for row in rows if row["state"] != "done"]
+    records = ResultSpool(out_file_path, existing=resume_id is not None)
+    workers = max(1, min(workers, len(todo)))
+    per_process = max(1, settings["concurrency"] // workers)
+    cancel = threading.Event()
+
+    def scan_shard(key):
+        status[key]["Status"] = "running"
+        started = time.monotonic()
+        cmd = bucket_shard_cmd(
+            scan_mode, target, json.loads(key), settings, per_process
+        )
+        # A whole bucket can hold any number of findings: spool them to disk
+        shard_records = ResultSpool()
+        returncode, stderr = stream_trufflehog(
+            cmd, shard_records.append, cancel_event=cancel
+        )
+        status[key]["Seconds"] = round(time.monotonic() - started, 1)
+        return shard_records, returncode, stderr
+
+    failed = []
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            try:
+                pending = {pool.submit(scan_shard, key): key for key in todo}
+                while pending:
+                    done, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        key = pending.pop(future)
+                        try:
+                            shard_records, returncode, stderr = future.result()
+                        except Exception as e:
+                            shard_records, returncode, stderr = [], -1, str(e)
+                        status[key]["Findings"] = len(shard_records)
+                        if returncode != 0:
+                            # Partial output is dropped; the shard reruns on resume
+                            status[key]["Status"] = "failed"
+                            status[key]["Error"] = stderr[-300:]
+                            failed.append(key)
+                            continue
+                        # Only this thread writes the spool, so lines never interleave
+                        records.extend(shard_records)
+                        records.flush()
+                        conn.execute(
+                            "UPDATE bucket_shards SET state = 'done', findings = ? "
+                            "WHERE run_id = ? AND shard = ?",
+                            (len(shard_records), run_id, key),
+                        )
+                        conn.execute(
+                            "UPDATE bucket_scans SET updated = ? WHERE id = ?",
+                            (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), run_id),
+                        )
+                        status[key]["Status"] = "done"
+
+                    finished = len(todo) - len(pending)
+                    progress.fraction(finished / len(todo) if todo else 1.0)
+                    progress.status(
+                        f"Shards: {finished}/{len(todo)} finished, {len(failed)} failed"
+                        f" | {len(records)} findings | "
+                        f"{workers} workers x --concurrency {per_process}"
+                    )
+                    progress.table(list(status.values()))
+            finally:
+                # Also reached when the script is interrupted: stop the shard
+                # processes before the pool waits for its threads
+                cancel.set()
+                pool.shutdown(wait=False, cancel_futures=True)
+        conn.execute(
+            "UPDATE bucket_scans SET state = ?, updated = ? WHERE id = ?",
+            (
+                "running" if failed else "done",
+                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                run_id,
+            ),
+        )
+    finally:
+        conn.close()
+    return records, [bucket_shard_label(json.loads(key)) for key in failed]
+
+
+# Source commands of the single-process scan modes, before the common flags
+def github_org_cmd(org):
+    return ["trufflehog", "github", "--org", org]
+
+
+def github_issues_cmd(repo):
+    return [
+        "trufflehog",
+        "github",
+        "--repo",
+        repo,
+        "--issue-comments",
+        "--pr-comments",
+    ]
+
+
+def github_experimental_cmd(repo):
+    return [
+        "trufflehog",
+        "github-experimental",
+        "--repo",
+        repo,
+        "--object-discovery",
+        "--delete-cached-data",
+    ]
+
+
+def postman_cmd(token, workspace_id, collection_id):
+    return [
+        "trufflehog",
+        "postman",
+        "--token",
+        token,
+        "--workspace-id",
+        workspace_id,
+        "--collection-id",
+        collection_id,
+    ]
+
+
+def jenkins_cmd(url, username, password):
+    return [
+        "trufflehog",
+        "jenkins",
+        "--url",
+        url,
+        "--username",
+        username,
+        "--password",
+        password,
+    ]
+
+
+# auth_type is username_password, service_token or cloud_id_api_key
+def elasticsearch_cmd(nodes, auth_type, auth):
+    cmd = ["trufflehog", "elasticsearch"] + nodes.split(",")
+    if auth_type == "username_password":
+        cmd += ["--username", auth.get("username", "")]
+        cmd += ["--password", auth.get("password", "")]
+    elif auth_type == "service_token":
+        cmd += ["--service-token", auth.get("service_token", "")]
+    else:
+        cmd += ["--cloud-id", auth.get("cloud_id", "")]
+        cmd += ["--api-key", auth.get("api_key", "")]
+    return cmd
+
+
+def huggingface_cmd(model="", space="", dataset="", org="", discussions=False):
+    cmd = ["trufflehog", "huggingface"]
+    if model:
+        cmd += ["--model", model]
+    if space:
+        cmd += ["--space", space]
+    if dataset:
+        cmd += ["--dataset", dataset]
+    if org:
+        cmd += ["--org", org]
+    if discussions:
+        cmd += ["--include-discussions", "--include-prs"]
+    return cmd
+
+
+# Fetch one page and stream its body to trufflehog's stdin source. A body
+# already scanned with these detectors reuses its cached findings. Returns
+# (records, error text or None, whether cached findings were reused).
+def scan_single_page(url, out_file_path, settings, cache=None, rate=10.0):
+    fetcher = HttpFetcher(per_host=1, rate=rate)
+    try:
+        body, content_hash = fetch_page(fetcher, url, cache)
+    finally:
+        fetcher.close()
+    cached = cache.findings(content_hash) if cache is not None else None
+    if cached is not None:
+        records = ResultSpool.from_chunks(
+            [[rebase_finding(r, url) for r in cached]], out_file_path
+        )
+        return records, None, True
+    records = ResultSpool(out_file_path)
+    cmd = common_flags(["trufflehog", "stdin"], settings)
+    returncode, stderr = stream_trufflehog(cmd, records.append, stdin_data=body)
+    records.rewrite(lambda r: rebase_finding(r, url))
+    if cache is not None and returncode == 0:
+        cache.store_findings({content_hash: list(records)})
+    return records, stderr if returncode != 0 else None, False
+
+
+# Batch scan profiles: the history scan mode each is stored under, the tag
+# used in its output file names and the target options it requires
+SCAN_PROFILES = {
+    "website": ("Website Scan (Single Page)", "single", ["url"]),
+    "crawl": ("Website Scan (Crawl Entire Site)", "crawl", ["url"]),
+    "dirbf": ("Website Scan (Directory Brute-Force)", "dirbf", ["url"]),
+    "git": ("Git Repository Scan", "gitrepo", ["repo"]),
+    "local-git": ("Local Git Repo Scan", "localgit", ["repo"]),
+    "ssh-git": ("SSH Git Repo Scan", "ssh", ["repo"]),
+    "github-org": ("GitHub Org Scan", "githuborg", ["org"]),
+    "github-issues": ("GitHub Repo + Issues/PR Scan", "ghissues", ["repo"]),
+    "github-experimental": ("GitHub Experimental Scan", "ghexp", ["repo"]),
+    "s3": ("S3 Bucket Scan", "s3", ["buckets"]),
+    "s3-role": ("S3 Bucket with IAM Role", "s3role", ["role_arn"]),
+    "gcs": ("GCS Bucket Scan", "gcs", ["project_id"]),
+    "filesystem": ("Filesystem Scan", "fs", ["paths"]),
+    "postman": ("Postman Workspace Scan", "postman", []),
+    "jenkins": ("Jenkins Scan", "jenkins", ["url"]),
+    "elasticsearch": ("ElasticSearch Scan", "es", ["nodes"]),
+    "huggingface": ("HuggingFace Scan", "hf", []),
+}
+
+
+# A target option given either as a JSON list or a separated string
+def option_list(value, sep=","):
+    if isinstance(value, str):
+        value = value.split(sep) if sep else value.split()
+    return [item.strip() for item in value if item.strip()]
+
+
+# Run one trufflehog process into a spool; returns (records, problems)
+def run_single_scan(cmd, out_file_path):
+    records = ResultSpool(out_file_path)
+    returncode, stderr = stream_trufflehog(cmd, records.append)
+    return records, [stderr or f"trufflehog exited {returncode}"] if returncode else []
+
+
+# Run one batch target (a dict with "profile" and that profile's options) the
+# way its UI scan mode does, and save it to the history. Returns (records,
+# scan id, problems), problems being the errors of any failed part.
+def run_target(spec, out_file_path, settings, progress=None):
+    progress = progress or ScanProgress()
+    profile = spec["profile"]
+    scan_mode = SCAN_PROFILES[profile][0]
+    workers = spec.get("workers", min(4, os.cpu_count() or 1))
+    problems = []
+
+    if profile in ("website", "crawl", "dirbf"):
+        target = spec["url"]
+        use_cache = spec.get("cache", True)
+        cache = PageCache(scan_detector_key(settings)) if use_cache else None
+        rate = spec.get("rate", 10.0)
+    if profile == "website":
+        records, error, reused = scan_single_page(
+            target, out_file_path, settings, cache, rate
+        )
+        if reused:
+            progress.notice("info", "Page unchanged since it was last scanned.")
+        if error:
+            problems.append(error)
+    elif profile == "crawl":
+        parsed = urlparse(target)
+        target = f"{parsed.scheme}://{parsed.netloc}"
+        scope = spec.get("scope", "Root Domain")
+        interrupted = unfinished_crawl(target, scope) if spec.get("resume") else None
+        if interrupted is not None:
+            out_file_path = interrupted["output_path"]
+            progress.notice(
+                "info",
+                f"Resuming interrupted crawl #{interrupted['id']} into {out_file_path}",
+            )
+        records = crawl_and_scan(
+            target,
+            spec.get("max_pages", 100),
+            scope,
+            out_file_path,
+            workers=spec.get("workers", 16),
+            per_host=spec.get("per_host", 4),
+            batch_size=spec.get("batch_size", 50),
+            resume_id=interrupted["id"] if interrupted is not None else None,
+            cache=cache,
+            rate=rate,
+            settings=settings,
+            progress=progress,
+        )
+    elif profile == "dirbf":
+        log_path = os.path.splitext(out_file_path)[0] + "_gobuster.txt"
+        cmd = gobuster_dir_cmd(
+            target,
+            spec.get("wordlist") or gobuster_wordlist(),
+            spec.get("threads", 50),
+            log_path,
+        )
+        records = bruteforce_and_scan(
+            cmd,
+            out_file_path,
+            workers=spec.get("workers", 16),
+            batch_size=spec.get("batch_size", 50),
+            cache=cache,
+            rate=rate,
+            settings=settings,
+            progress=progress,
+        )
+    elif profile in ("git", "local-git", "ssh-git"):
+        plan = plan_git_scan(
+            spec["repo"], spec.get("branch", ""), spec.get("incremental"), settings
+        )
+        if spec.get("incremental") and not plan["head"]:
+            progress.notice(
+                "warning",
+                "Could not resolve the repository HEAD; watermark not updated.",
+            )
+        if spec.get("incremental") and plan["watermark"] is None:
+            progress.notice(
+                "info", "No earlier scan to continue from; running a full scan."
+            )
+        if plan["cmd"] is None:
+            progress.notice("info", f"No new commits since {plan['head'][:12]}.")
+            new_records, ok = [], True
+        else:
+            new_records, problems = run_single_scan(plan["cmd"], out_file_path)
+            ok = not problems
+        progress.status("Saving to history...")
+        records, scan_id = finish_git_scan(scan_mode, plan, new_records, ok)
+        return records, scan_id, problems
+    elif profile == "github-org":
+        target = spec["org"]
+        repos = option_list(spec.get("repos", []))
+        if spec.get("parallel") and not repos:
+            progress.status(f"Listing repositories of {target}...")
+            repos = list_org_repos(
+                target,
+                spec.get("api_url", "https://api.github.com"),
+                spec.get("token", ""),
+                spec.get("include_forks", False),
+            )
+        if repos:
+            records, failed = fan_out_org_scan(
+                repos, out_file_path, workers, settings, progress
+            )
+            problems += [f"{repo} failed" for repo in failed]
+            if spec.get("merge_scan_id") is not None:
+                # A retry completes the earlier run rather than replacing it
+                records = ResultSpool.from_chunks(
+                    [load_scan_findings(spec["merge_scan_id"]), records]
+                )
+        else:
+            cmd = common_flags(github_org_cmd(target), settings)
+            records, problems = run_single_scan(cmd, out_file_path)
+    elif profile in ("s3", "s3-role", "gcs"):
+        if profile == "s3":
+            entries = option_list(spec["buckets"])
+            target = ",".join(entries)
+        else:
+            entries = option_list(spec.get("buckets", []), None)
+            target = spec["role_arn" if profile == "s3-role" else "project_id"]
+        resume = (
+            unfinished_bucket_scan(scan_mode, target) if spec.get("resume") else None
+        )
+        if resume is not None:
+            out_file_path, shards = resume["output_path"], []
+            progress.notice(
+                "info",
+                f"Resuming interrupted scan #{resume['id']} into {out_file_path}",
+            )
+        else:
+            shards = bucket_shards(
+                scan_mode,
+                entries,
+                spec.get("split_prefixes", False),
+                spec.get("endpoint", GCS_API_ENDPOINT),
+                spec.get("token", ""),
+            )
+        if resume is None and len(shards) == 1:
+            cmd = bucket_shard_cmd(scan_mode, target, shards[0], settings)
+            records, problems = run_single_scan(cmd, out_file_path)
+        else:
+            records, failed = scan_bucket_shards(
+                scan_mode,
+                target,
+                shards,
+                out_file_path,
+                workers,
+                settings,
+                resume["id"] if resume is not None else None,
+                progress,
+            )
+            problems += [f"shard {label} failed" for label in failed]
+            if failed:
+                progress.notice(
+                    "warning",
+                    f"{len(failed)} shard(s) failed; their partial findings were "
+                    "dropped. Resume the scan to rescan them.",
+                )
+    elif profile == "filesystem":
+        paths = option_list(spec["paths"])
+        target = ",".join(paths)
+        records, failed = scan_filesystem_sharded(
+            paths,
+            out_file_path,
+            workers,
+            settings,
+            exclude_exts=option_list(
+                spec.get("exclude_extensions", FS_EXCLUDE_EXTENSIONS), None
+            ),
+            exclude_globs=option_list(spec.get("exclude_globs", FS_EXCLUDE_GLOBS)),
+            max_bytes=spec.get("max_file_mb", 100) * 1024 * 1024,
+            skip_unchanged=spec.get("skip_unchanged", True),
+            progress=progress,
+        )
+        if failed:
+            problems.append(f"{failed} shard(s) failed")
+    else:
+        if profile == "github-issues":
+            target, cmd = spec["repo"], github_issues_cmd(spec["repo"])
+        elif profile == "github-experimental":
+            target, cmd = spec["repo"], github_experimental_cmd(spec["repo"])
+        elif profile == "postman":
+            workspace, collection = spec.get("workspace_id", ""), spec.get(
+                "collection_id", ""
+            )
+            target = workspace or collection
+            cmd = postman_cmd(spec.get("token", ""), workspace, collection)
+        elif profile == "jenkins":
+            target = spec["url"]
+            cmd = jenkins_cmd(
+                target, spec.get("username", ""), spec.get("password", "")
+            )
+        elif profile == "elasticsearch":
+            target = spec["nodes"]
+            cmd = elasticsearch_cmd(
+                target, spec.get("auth_type", "username_password"), spec
+            )
+        else:
+            hf = [spec.get(k, "") for k in ("model", "space", "dataset", "org")]
+            target = ",".join(x for x in hf if x)
+            cmd = huggingface_cmd(*hf, spec.get("include_discussions", False))
+        records, problems = run_single_scan(common_flags(cmd, settings), out_file_path)
+
+    if settings["verify"] is not None and records:
+        progress.status("Verifying distinct secrets...")
+        stats = verify_findings(records, **settings["verify"])
+        progress.notice(
+            "text",
+            f"Verification: {stats['candidates']} distinct secret(s) from "
+            f"{stats['findings']} finding(s); {stats['cached']} from cache, "
+            f"{stats['checked']} checked, {stats['verified']} verified, "
+            f"{stats['dropped']} finding(s) of invalid secrets dropped.",
+        )
+        if stats["unresolved"]:
+            progress.notice(
+                "warning",
+                f"{stats['unresolved']} distinct secret(s) could not be re-checked "
+                "and are left unverified.",
+            )
+    progress.status("Saving to history...")
+    records, scan_id = record_scan(scan_mode, records, target, settings["aggregate"])
+    progress.status(f"Saved {len(records)} finding(s) as scan #{scan_id}.")
+    return records, scan_id, problems